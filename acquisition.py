@@ -0,0 +1,84 @@
+######################################################################################
+# The PAR acquisition loop, kept apart from the instrument so recorded runs can be replayed through it
+######################################################################################
+
+import time
+
+import numpy as np
+
+from kbio.kbio_tech import get_experiment_data
+from kbio.kbio_tech import get_info_data
+from databus import DataBus
+from rawarchive import RawArchiveWriter, decode_cv
+from timeline import TIMELINE, now
+
+
+class CsvWriter:
+    # Bus consumer that appends each poll to <filename>.csv and flushes, so whatever was measured stays on
+    # disk if the run dies part way
+    def __init__(self, filename, api, board_type):
+        self.file = open(f"{filename}.csv", "w")
+        self.file.write("t (s),I (A)\n")
+        self.api = api
+        self.board_type = board_type
+
+    def write(self, current_values, data_info, columns):
+        if "I" in columns:
+            np.savetxt(self.file, np.column_stack((columns["t"], columns["I"])), fmt="%.9g", delimiter=",")
+        else:
+            status, tech_name = get_info_data(self.api, (current_values, data_info, None))
+            for output in get_experiment_data(self.api, (current_values, data_info, columns.get("words", [])),
+                                              tech_name, self.board_type):
+                self.file.write(f"{output}")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def acquire(api, conn_id, channel, board_type, filename, interval=1.0, timeline=TIMELINE, verbose=True,
+            bus=None):
+    # Polls GetData until the channel stops. The raw words go straight into <filename>.kbraw, then every poll
+    # is published on the bus as (current_values, data_info, columns), columns being the decoded CV data, or
+    # just the raw words for other techniques. The CSV writer is one subscriber; anything else (analysis,
+    # plots, monitors) subscribes to the bus before calling this. The bus is closed, and so drained, on return.
+    # If a block consumer (the CSV writer, analysis) failed the run raises, its output cannot be trusted.
+    # api only needs GetData and the value conversion, so replay.ReplaySource can stand in for the instrument.
+    bus = bus or DataBus()
+    csv = CsvWriter(filename, api, board_type)
+    bus.subscribe("csv", csv.write, "block", maxsize=256)
+    if verbose:
+        bus.subscribe("status", lambda current_values, data_info, columns: print("."), "coalesce")
+    archive = RawArchiveWriter(f"{filename}.kbraw", board_type)  # Raw words, can be decoded again later
+    count = 0
+    try:
+        while True:
+            # BL_GetData
+            before = now()
+            data = api.GetData(conn_id, channel)
+            after = now()
+            current_values, data_info, words = data
+            timeline.observe_clock("par", data_info.StartTime + current_values.ElapsedTime, before, after)
+            archive.append(data, before)
+            status, tech_name = get_info_data(api, data)
+
+            if tech_name == "CV" and data_info.NbRows > 0:
+                bus.publish(current_values, data_info,
+                            decode_cv(words, data_info.NbCols, current_values.TimeBase, board_type, api))
+            else:
+                bus.publish(current_values, data_info, {"words": words})
+            count += data_info.NbRows
+
+            if status == "STOP":
+                break
+
+            time.sleep(interval)
+    finally:
+        archive.close()
+        bus.close()
+        csv.close()
+    failed = bus.failed()
+    if failed:
+        raise RuntimeError("Data consumers failed: " + ", ".join(f"{subscriber.name} ({subscriber.error})"
+                                                                  for subscriber in failed)) from failed[0].error
+    return count
@@ -2,9 +2,22 @@
 # Controls the ADLINK PCIe-9101 card
 ######################################################################################
 
+import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from ctypes import c_double, c_uint16, addressof, byref, sizeof
 
+import numpy as np
+
+import chiptest
 import dask91xx
+from chipdefects import DefectRegistry
+from definitions import CONFIG
+from dask91xx import Dask91xxLib
+from ringbuffer import RingBuffer
+from timeline import TIMELINE, now
 
 
 def wait(duration, get_now=time.perf_counter): # Allows for more precise nanosecond wait times
@@ -14,13 +27,28 @@ def wait(duration, get_now=time.perf_counter): # Allows for more precise nanosec
         now = get_now()
 
 class Adlink:
-    def __init__(self):
-        self.dask = dask91xx.Dask91xxLib()
-        self.var_card = self.dask.Register_Card(52, 0)  # PCIe_9101 = 52, see dask91xx.py
-        if self.var_card < 0:
-            print(f"UD_Register_Card fail, error = {self.var_card}\n")
-            exit()
-        print("Register card successfully")
+    def __init__(self, chip="", card_num=0, dask=None, var_card=None):
+        self.defects = DefectRegistry(chip)  # Used for every channel when the card drives a single socket
+        self.channel_defects = {}  # Channel -> registry of the chip in that socket, see assign_chip
+        self.current_maps = {}  # Channel -> map known to be on the chip, -1 where a cell's state is unknown
+        self.card_num = card_num
+        self.lock = threading.RLock()  # All channels of a card share the DO/DI port
+        self.dask = dask if dask is not None else dask91xx.Dask91xxLib()
+        if var_card is None:
+            var_card = self.dask.Register_Card(52, card_num)  # PCIe_9101 = 52, see dask91xx.py
+            if var_card < 0:
+                print(f"UD_Register_Card fail, error = {var_card}\n")
+                exit()
+            print("Register card successfully")
+        self.var_card = var_card
+        self.io = self.dask.fast_io(var_card)
+
+    def assign_chip(self, channel, chip):
+        self.channel_defects[channel] = DefectRegistry(chip)
+        self.current_maps.pop(channel, None)
+
+    def defects_for(self, channel):
+        return self.channel_defects.get(channel, self.defects)
 
     def release_adlink(self):
         if self.var_card >= 0:
@@ -28,17 +56,64 @@ class Adlink:
 
         print("Card release")
 
-    def set_chip_map(self, channel, chipmap):
-        for column in range(16):
-            for row in range(64):
-                value = chipmap[row][column]
-                self.set_chip_state(channel, row, column, value)
+    def set_chip_map(self, channel, chipmap, full=False):
+        # Only cells that differ from the map already on the chip are written, unless full is set
+        with self.lock:
+            started = now()
+            flagged = self._set_chip_map(channel, chipmap, None if full else self.current_maps.get(channel))
+            TIMELINE.record("chip_map", card=self.card_num, channel=channel, chipmap=chipmap, started=started)
+            return flagged
 
-                # Cause the old chips have problems double check setting was successful
-                count = 0 # Limit the amount of times while loop can loop
-                while self.get_chip_state(channel, row, column) != value and count < 10:
+    def _set_chip_map(self, channel, chipmap, previous=None):
+        defects = self.defects_for(channel)
+        current = [row[:] for row in chipmap]
+        flagged = []  # Known dead cells this map asks for, written once without retries
+        # A port error raises out of here, the cells recorded before it are still saved
+        try:
+            for column in range(16):
+                for row in range(64):
+                    value = chipmap[row][column]
+                    if previous is not None and previous[row][column] == value:
+                        continue
                     self.set_chip_state(channel, row, column, value)
-                    count +=1
+
+                    limit = defects.retry_limit(row, column, value)
+                    if limit == 0:
+                        flagged.append((row, column, value))
+                        current[row][column] = -1
+                        continue
+
+                    # Cause the old chips have problems double check setting was successful
+                    count = 0 # Limit the amount of times while loop can loop
+                    success = self.get_chip_state(channel, row, column) == value
+                    while not success and count < limit:
+                        self.set_chip_state(channel, row, column, value)
+                        success = self.get_chip_state(channel, row, column) == value
+                        count +=1
+                    defects.record(row, column, value, success, count)
+                    if not success:
+                        current[row][column] = -1
+        except Exception:
+            self.current_maps.pop(channel, None)  # Part written, nothing is known about the chip any more
+            raise
+        finally:
+            defects.save()
+        self.current_maps[channel] = current
+        if flagged:
+            print(f"Skipped {len(flagged)} known dead cells: " +
+                  ", ".join(f"({row}, {column})={value}" for row, column, value in flagged))
+        return flagged
+
+    def write_chip_map(self, channel, chipmap, order=chiptest.ASCENDING):
+        # Program every cell without verifying, the caller reads the whole map back afterwards
+        with self.lock:
+            self.current_maps.pop(channel, None)
+            for row, column in order:
+                self.set_chip_state(channel, row, column, int(chipmap[row][column]))
+
+    def self_test(self, channel, patterns=None):
+        with self.lock:
+            return chiptest.run_self_test(self, channel, patterns)
 
     def set_chip_state(self, channel, row, column, value):
         channel <<= 13
@@ -52,27 +127,26 @@ class Adlink:
         wr <<= 12
         dataToWrite = address | value | wr | channel
 
-        self.dask.DO_WritePort(self.var_card, 0, dataToWrite)
+        self.io.DO_WritePort(dataToWrite)
         wait(0.00001)
 
         wr = 0b1
         wr <<= 12
         dataToWrite = address | value | wr | channel
 
-        self.dask.DO_WritePort(self.var_card, 0, dataToWrite)
+        self.io.DO_WritePort(dataToWrite)
         wait(0.00001)
 
     def get_chip_map(self, channel):
         chipmap = [[0] * 16 for _ in range(64)]
-        for column in range(16):
-            for row in range(64):
-                chipmap[row][column] = self.get_chip_state(channel, row, column)
+        with self.lock:
+            for column in range(16):
+                for row in range(64):
+                    chipmap[row][column] = self.get_chip_state(channel, row, column)
 
         return chipmap
 
     def get_chip_state(self, channel, row, column):
-        dataRead = []
-
         channel <<= 13
 
         address = column
@@ -83,12 +157,279 @@ class Adlink:
         wr <<= 12
         dataToWrite = address | wr | channel
 
-        self.dask.DO_WritePort(self.var_card, 0, dataToWrite)
+        self.io.DO_WritePort(dataToWrite)
         wait(0.00001)
-        self.dask.DI_ReadPort(self.var_card, 0, dataRead)
+        dataRead = self.io.DI_ReadPort()  # Raises on a port error, so a failed read never looks like a state
         wait(0.00001)
 
-        value = dataRead[0] >> 14
+        value = dataRead >> 14
 
         return value
 
+
+
+class AdlinkManager:
+    # Registers every PCIe-9101 in the station and programs chips on them in parallel, one lock per card
+    def __init__(self, chip="", max_cards=8, workers=None):
+        self.dask = dask91xx.Dask91xxLib()
+        self.channels = [int(channel) for channel in CONFIG.get('Adlink', 'chip_channels', fallback='1').split(',')]
+        self.cards = []
+        for card_num in range(max_cards):
+            var_card = self.dask.Register_Card(dask91xx.Dask91xxLib.PCIe_9101, card_num)
+            if var_card < 0:
+                break
+            self.cards.append(Adlink("", card_num, self.dask, var_card))
+        if not self.cards:
+            print("UD_Register_Card fail, no PCIe-9101 found\n")
+            exit()
+        # The chosen chip is in the first socket. Sockets without a chip identity skip and record nothing,
+        # their defects would otherwise end up in another chip's registry.
+        if chip:
+            self.assign_chip(0, self.channels[0], chip)
+        print(f"Registered {len(self.cards)} card(s), chip channels {self.channels}")
+        self.pool = ThreadPoolExecutor(max_workers=workers or len(self.cards) * len(self.channels),
+                                       thread_name_prefix="adlink")
+
+    def card(self, card_num=0):
+        return self.cards[card_num]
+
+    def sockets(self):
+        return [(card.card_num, channel) for card in self.cards for channel in self.channels]
+
+    def assign_chip(self, card_num, channel, chip):
+        self.cards[card_num].assign_chip(channel, chip)
+
+    def program(self, card_num, channel, chipmap):
+        # Returns a Future, maps for the same card queue up behind the card lock
+        return self.pool.submit(self.cards[card_num].set_chip_map, channel, chipmap)
+
+    def program_all(self, jobs):
+        # jobs is a list of (card_num, channel, chipmap), returns the dead cells flagged for each job
+        futures = [self.program(card_num, channel, chipmap) for card_num, channel, chipmap in jobs]
+        wait_futures(futures)
+        return [future.result() for future in futures]
+
+    def release_adlink(self):
+        self.pool.shutdown(wait=True)
+        for card in self.cards:
+            card.release_adlink()
+
+
+class AIStream:
+    # Continuous double-buffered AI on a background thread. Every half buffer is scaled to volts in one
+    # AI_ContVScale call and pushed into a RingBuffer with one column per channel.
+    SAMPLE_TYPE = c_uint16
+
+    def __init__(self, card, channels, sample_rate, ad_range=Dask91xxLib.AD_B_10_V, half_size=8192, seconds=60):
+        self.card = card
+        self.channels = list(channels)
+        self.sample_rate = sample_rate  # Per channel scan rate in Hz
+        self.ad_range = ad_range
+        self.half_size = half_size - half_size % len(self.channels)  # Keep whole scans in each half
+        self.ring = RingBuffer(int(sample_rate * seconds), len(self.channels))
+        self.overruns = 0
+        self.gaps = []  # (scan index of the first scan after samples were lost, scans lost), see latest()
+        self.start_time = None  # time.perf_counter() when the scan was started
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.buffer = (self.SAMPLE_TYPE * (self.half_size * 2))()
+        self.volts = (c_double * self.half_size)()
+        self.volts_array = np.frombuffer(self.volts, dtype=np.float64).reshape(-1, len(self.channels))
+        self.buffer_id = c_uint16(0)
+
+    def start(self):
+        dask, var_card = self.card.dask, self.card.var_card
+        chans = (c_uint16 * len(self.channels))(*self.channels)
+        ranges = (c_uint16 * len(self.channels))(*[self.ad_range] * len(self.channels))
+
+        rtn = dask.AI_Config(var_card, Dask91xxLib.P91xx_AI_SingEnded | Dask91xxLib.P91xx_AI_TIMEBASE_INT,
+                             Dask91xxLib.P91xx_AI_TRGMOD_POST | Dask91xxLib.P91xx_AI_TRGSRC_SOFT, 0, 0, 1)
+        if rtn < 0:
+            raise RuntimeError(f"AI_Config fail, error = {rtn}")
+        dask.AI_AsyncDblBufferMode(var_card, 1)
+        rtn = dask.AI_ContBufferSetup(var_card, self.buffer, len(self.buffer), byref(self.buffer_id))
+        if rtn < 0:
+            raise RuntimeError(f"AI_ContBufferSetup fail, error = {rtn}")
+
+        self.ring.clear()
+        self.gaps = []
+        self._stop.clear()
+        self.start_time = time.perf_counter()
+        rtn = dask.AI_ContReadMultiChannels(var_card, len(self.channels), chans, ranges, self.buffer_id.value,
+                                            len(self.buffer), c_double(self.sample_rate), Dask91xxLib.ASYNCH_OP)
+        if rtn < 0:
+            raise RuntimeError(f"AI_ContReadMultiChannels fail, error = {rtn}")
+
+        self._thread = threading.Thread(target=self._run, name="ai-stream", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        dask, var_card, io = self.card.dask, self.card.var_card, self.card.io
+        half_bytes = self.half_size * sizeof(self.SAMPLE_TYPE)
+        halves = [addressof(self.buffer), addressof(self.buffer) + half_bytes]
+        overrun = []
+        current = 0
+        scans_per_half = self.half_size // len(self.channels)
+        lost = 0  # Scans lost to overruns so far
+        try:
+            while not self._stop.is_set():
+                rtn, half_ready, stopped = io.AI_AsyncDblBufferHalfReady()
+                if rtn < 0:
+                    raise RuntimeError(f"AI_AsyncDblBufferHalfReady fail, error = {rtn}")
+                if not half_ready:
+                    if stopped:
+                        break
+                    time.sleep(0.0005)
+                    continue
+
+                io.AI_ContVScale(self.ad_range, halves[current], addressof(self.volts), self.half_size)
+                dask.AI_AsyncDblBufferHandled(var_card)
+                self.ring.extend(self.volts_array)
+                current ^= 1
+
+                # The driver overwrote a half we had not handled yet, so whole halves were lost just before
+                # the one we just read. How many comes from the clock: the scans that should exist by now
+                # less those accounted for, rounded down to whole halves to leave out the one being filled.
+                dask.AI_AsyncDblBufferOverrun(var_card, 0, overrun)
+                if overrun and overrun[0]:
+                    self.overruns += 1
+                    first = self.ring.total - scans_per_half
+                    expected = (time.perf_counter() - self.start_time) * self.sample_rate
+                    halves = max(1, int((expected - self.ring.total - lost) // scans_per_half))
+                    lost += halves * scans_per_half
+                    self.gaps.append((first, halves * scans_per_half))
+                    print(f"AI overrun on card {self.card.card_num}, {self.overruns} so far, "
+                          f"about {halves * scans_per_half} scans lost before scan {first}")
+                    dask.AI_AsyncDblBufferOverrun(var_card, 1, 0)
+        except Exception as e:
+            self.error = e
+            print(f"AI stream stopped: {e}")
+        finally:
+            dask.AI_AsyncClear(var_card, [])
+            dask.AI_AsyncDblBufferMode(var_card, 0)
+            dask.AI_ContBufferReset(var_card)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def latest(self, count=None):
+        # Returns (times, volts), times are perf_counter seconds so they line up with host side events.
+        # Scans after an overrun are moved on by the scans lost before them, so times jump across a gap.
+        volts, first = self.ring.latest(count)
+        index = first + np.arange(len(volts))
+        gaps = np.array(self.gaps, dtype=np.int64).reshape(-1, 2)
+        shift = np.r_[0, np.cumsum(gaps[:, 1])][np.searchsorted(gaps[:, 0], index, side="right")]
+        times = self.start_time + (index + shift) / self.sample_rate
+        return times, volts
+
+
+class AIFileCapture:
+    # Long captures straight to disk, the driver writes each half buffer with AI_AsyncDblBufferToFile so
+    # samples never pass through Python. A sidecar <file>.json describes the capture for aifile.AIFileReader.
+    def __init__(self, card, channels, sample_rate, file_path, ad_range=Dask91xxLib.AD_B_10_V, half_size=65536):
+        self.card = card
+        self.channels = list(channels)
+        self.sample_rate = sample_rate
+        self.file_path = os.path.abspath(file_path)
+        self.ad_range = ad_range
+        self.half_size = half_size - half_size % len(self.channels)
+        self.halves_written = 0
+        self.overruns = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.info = {}
+
+    def start(self):
+        dask, var_card = self.card.dask, self.card.var_card
+        chans = (c_uint16 * len(self.channels))(*self.channels)
+        ranges = (c_uint16 * len(self.channels))(*[self.ad_range] * len(self.channels))
+
+        rtn = dask.AI_Config(var_card, Dask91xxLib.P91xx_AI_SingEnded | Dask91xxLib.P91xx_AI_TIMEBASE_INT,
+                             Dask91xxLib.P91xx_AI_TRGMOD_POST | Dask91xxLib.P91xx_AI_TRGSRC_SOFT, 0, 0, 1)
+        if rtn < 0:
+            raise RuntimeError(f"AI_Config fail, error = {rtn}")
+        dask.AI_AsyncDblBufferMode(var_card, 1)
+
+        self.info = {
+            "channels": self.channels,
+            "ad_range": self.ad_range,
+            "sample_rate": self.sample_rate,
+            "dtype": "uint16",
+            **self._scaling(),
+            "start_perf_counter": time.perf_counter(),
+            "start_time": time.time(),
+            "sample_count": None,  # Filled in by stop(), counts single samples, not scans
+            "header_size": None,  # Bytes the driver writes before the samples, known once the first half is on disk
+        }
+        self._write_info()
+
+        self._stop.clear()
+        rtn = dask.AI_ContReadMultiChannelsToFile(var_card, len(self.channels), chans, ranges,
+                                                  self.file_path.encode(), self.half_size * 2,
+                                                  c_double(self.sample_rate), Dask91xxLib.ASYNCH_OP)
+        if rtn < 0:
+            raise RuntimeError(f"AI_ContReadMultiChannelsToFile fail, error = {rtn}")
+        self._thread = threading.Thread(target=self._run, name="ai-file-capture", daemon=True)
+        self._thread.start()
+
+    def _scaling(self):
+        # Ask the driver how it scales codes so the reader never needs the DLL
+        v0, v1, vmid = [], [], []
+        self.card.dask.AI_VoltScale(self.card.var_card, self.ad_range, 0, v0)
+        self.card.dask.AI_VoltScale(self.card.var_card, self.ad_range, 1, v1)
+        self.card.dask.AI_VoltScale(self.card.var_card, self.ad_range, 0x8000, vmid)
+        return {"signed": vmid[0] < v0[0], "slope": v1[0] - v0[0], "offset": v0[0]}
+
+    def _run(self):
+        dask, var_card, io = self.card.dask, self.card.var_card, self.card.io
+        overrun = []
+        try:
+            while not self._stop.is_set():
+                rtn, half_ready, stopped = io.AI_AsyncDblBufferHalfReady()
+                if rtn < 0:
+                    raise RuntimeError(f"AI_AsyncDblBufferHalfReady fail, error = {rtn}")
+                if not half_ready:
+                    if stopped:
+                        break
+                    time.sleep(0.005)
+                    continue
+                dask.AI_AsyncDblBufferToFile(var_card)
+                dask.AI_AsyncDblBufferHandled(var_card)
+                self.halves_written += 1
+                if self.info["header_size"] is None:  # Recorded now so a capture that dies can still be read
+                    self.info["header_size"] = os.path.getsize(self.file_path) - self.half_size * 2
+                    self._write_info()
+
+                dask.AI_AsyncDblBufferOverrun(var_card, 0, overrun)
+                if overrun and overrun[0]:
+                    self.overruns += 1
+                    print(f"AI file capture overrun on card {self.card.card_num}, {self.overruns} so far")
+                    dask.AI_AsyncDblBufferOverrun(var_card, 1, 0)
+        except Exception as e:
+            self.error = e
+            print(f"AI file capture stopped: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        access_count = []
+        self.card.dask.AI_AsyncClear(self.card.var_card, access_count)  # Flushes the partial half to file
+        self.card.dask.AI_AsyncDblBufferMode(self.card.var_card, 0)
+
+        self.info["sample_count"] = self.halves_written * self.half_size + (access_count[0] if access_count else 0)
+        if self.info["header_size"] is None:
+            self.info["header_size"] = os.path.getsize(self.file_path) - self.info["sample_count"] * 2
+        self.info["overruns"] = self.overruns
+        self._write_info()
+
+    def _write_info(self):
+        with open(self.file_path + ".json", 'w') as file:
+            json.dump(self.info, file, indent=1)
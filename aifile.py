@@ -0,0 +1,61 @@
+######################################################################################
+# Reader for raw AI captures written by adlink.AIFileCapture
+######################################################################################
+
+import json
+import os
+
+import numpy as np
+
+
+class AIFileReader:
+    # Memory maps the raw capture, nothing is read or scaled until a slice is asked for
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with open(file_path + ".json", 'r') as file:
+            self.info = json.load(file)
+
+        self.channels = self.info["channels"]
+        self.sample_rate = self.info["sample_rate"]
+        self.start_time = self.info["start_perf_counter"]
+        dtype = np.dtype(self.info["dtype"])
+
+        # The driver puts its own header in front of the samples, everything after it is data
+        file_size = os.path.getsize(file_path)
+        sample_count = self.info["sample_count"]
+        header = self.info.get("header_size")
+        if header is None:
+            if sample_count is None:
+                raise ValueError(f"{file_path} stopped before its first half buffer, the header size is unknown")
+            header = file_size - sample_count * dtype.itemsize
+        if sample_count is None:  # Capture still running or crashed, take every whole scan on disk
+            sample_count = (file_size - header) // dtype.itemsize
+        sample_count -= sample_count % len(self.channels)
+
+        self.raw = np.memmap(file_path, dtype=dtype, mode='r', offset=header,
+                             shape=(sample_count // len(self.channels), len(self.channels)))
+        if self.info["signed"]:
+            self.raw = self.raw.view(np.int16 if dtype.itemsize == 2 else np.int32)
+
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def duration(self):
+        return len(self.raw) / self.sample_rate
+
+    def volts(self, start=0, stop=None, channel=None):
+        raw = self.raw[start:stop] if channel is None else self.raw[start:stop, self.channels.index(channel)]
+        return raw * self.info["slope"] + self.info["offset"]
+
+    def times(self, start=0, stop=None):
+        stop = len(self.raw) if stop is None else min(stop, len(self.raw))
+        return self.start_time + np.arange(start, stop) / self.sample_rate
+
+    def index_of(self, t):
+        # First scan at or after a perf_counter time, clipped to the capture
+        return int(np.clip(np.ceil((t - self.start_time) * self.sample_rate - 1e-9), 0, len(self.raw)))
+
+    def between(self, t_start, t_end, channel=None):
+        start, stop = self.index_of(t_start), self.index_of(t_end)
+        return self.times(start, stop), self.volts(start, stop, channel)
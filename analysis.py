@@ -0,0 +1,99 @@
+######################################################################################
+# Streaming CV analysis: per cycle peaks, charge and drift, updated on every poll
+######################################################################################
+
+import json
+from dataclasses import dataclass, asdict
+
+import numpy as np
+
+
+@dataclass
+class CycleSummary:
+    cycle: int
+    points: int = 0
+    t_start: float = 0.0
+    t_end: float = 0.0
+    E_min: float = np.inf
+    E_max: float = -np.inf
+    Ipa: float = -np.inf  # Anodic peak current and the potential it was at
+    Epa: float = np.nan
+    Ipc: float = np.inf  # Cathodic peak current and the potential it was at
+    Epc: float = np.nan
+    charge: float = 0.0  # Net charge passed, C
+    anodic_charge: float = 0.0
+    cathodic_charge: float = 0.0
+
+    @property
+    def peak_separation(self):
+        return self.Epa - self.Epc
+
+
+class StreamingCVAnalyzer:
+    # Attach feed() as an acquisition listener. Only the running cycle and one finished summary per cycle are
+    # kept, so memory does not grow with the number of points. The charge integral carries the last sample of
+    # each poll over to the next, so splitting the data into polls does not change the result.
+    def __init__(self):
+        self.cycles = []
+        self.current = None
+        self.last = None  # (t, I) of the previous sample, for the trapezoid across poll boundaries
+
+    def feed(self, current_values, data_info, columns):
+        if "I" not in columns or len(columns["I"]) == 0:
+            return
+        t, current, potential, cycle = columns["t"], columns["I"], columns["Ewe"], columns["cycle"]
+        edges = np.flatnonzero(np.diff(cycle)) + 1
+        for start, stop in zip(np.r_[0, edges], np.r_[edges, len(t)]):
+            self.add(int(cycle[start]), t[start:stop], current[start:stop].astype(np.float64),
+                     potential[start:stop].astype(np.float64))
+
+    def add(self, cycle, t, current, potential):
+        if self.current is None or self.current.cycle != cycle:
+            self.close_cycle()
+            self.current = CycleSummary(cycle, t_start=float(t[0]))
+        summary = self.current
+        summary.points += len(t)
+        summary.t_end = float(t[-1])
+        summary.E_min = min(summary.E_min, float(potential.min()))
+        summary.E_max = max(summary.E_max, float(potential.max()))
+        high, low = current.argmax(), current.argmin()
+        if current[high] > summary.Ipa:
+            summary.Ipa, summary.Epa = float(current[high]), float(potential[high])
+        if current[low] < summary.Ipc:
+            summary.Ipc, summary.Epc = float(current[low]), float(potential[low])
+
+        if self.last is not None:  # Join onto the previous poll's last sample
+            t = np.r_[self.last[0], t]
+            current = np.r_[self.last[1], current]
+        if len(t) > 1:
+            dt = np.diff(t)
+            mean = (current[1:] + current[:-1]) / 2
+            summary.charge += float(np.dot(dt, mean))
+            summary.anodic_charge += float(np.dot(dt, np.clip(mean, 0, None)))
+            summary.cathodic_charge += float(np.dot(dt, np.clip(mean, None, 0)))
+        self.last = (float(t[-1]), float(current[-1]))
+
+    def close_cycle(self):
+        if self.current is not None:
+            self.cycles.append(self.current)
+            self.current = None
+
+    def finish(self):
+        # Call once the channel stops, the last cycle has no boundary after it to close it
+        self.close_cycle()
+        return self.summary()
+
+    def drift(self):
+        # Change of each peak and of the charge from one cycle to the next
+        return [{"cycle": b.cycle, "dEpa": b.Epa - a.Epa, "dIpa": b.Ipa - a.Ipa, "dEpc": b.Epc - a.Epc,
+                 "dIpc": b.Ipc - a.Ipc, "dcharge": b.charge - a.charge}
+                for a, b in zip(self.cycles, self.cycles[1:])]
+
+    def summary(self):
+        cycles = self.cycles + ([self.current] if self.current is not None else [])
+        return {"cycles": [dict(asdict(cycle), peak_separation=cycle.peak_separation) for cycle in cycles],
+                "drift": self.drift()}
+
+    def save(self, path, **extra):
+        with open(path, "w") as file:
+            json.dump(dict(self.summary(), **extra), file, indent=1)
@@ -0,0 +1,152 @@
+######################################################################################
+# SQLite catalogue of every measurement with the metadata needed to find it again
+######################################################################################
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from definitions import CONFIG, GET_CHIP, GET_COUNTER_ELECTRODE, GET_REFERENCE_ELECTRODE, GET_WORKING_ELECTRODE
+from resultcache import experiment_key, results_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    key TEXT NOT NULL,
+    solution TEXT,
+    technique TEXT,
+    block TEXT,
+    block_rows INTEGER,
+    block_cols INTEGER,
+    start_row INTEGER,
+    start_col INTEGER,
+    vcfg TEXT,
+    scan_rate REAL,
+    v_start REAL,
+    v_end REAL,
+    cycles INTEGER,
+    well TEXT,
+    chip TEXT,
+    counter TEXT,
+    reference TEXT,
+    working TEXT,
+    user TEXT,
+    customer TEXT,
+    data_file TEXT NOT NULL,
+    experiment TEXT NOT NULL,
+    stop_reason TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_chip_block_rate ON runs (chip, block, scan_rate);
+CREATE INDEX IF NOT EXISTS runs_solution ON runs (solution, technique);
+CREATE INDEX IF NOT EXISTS runs_vcfg ON runs (vcfg);
+CREATE INDEX IF NOT EXISTS runs_user ON runs (user, customer);
+CREATE INDEX IF NOT EXISTS runs_finished ON runs (finished);
+CREATE INDEX IF NOT EXISTS runs_key ON runs (key);
+"""
+
+COLUMNS = ("solution", "technique", "block", "vcfg", "scan_rate", "well", "chip", "counter", "reference",
+           "working", "user", "customer", "key")
+FLOAT_TOLERANCE = 1e-9  # Scan rates come from config files, so compare them with a little slack
+
+
+class Catalogue:
+    def __init__(self, path=None):
+        path = path or self.default_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    @staticmethod
+    def default_path():
+        return os.path.join(results_dir(), "catalogue.sqlite")
+
+    @staticmethod
+    def describe(exp, data_file):
+        # The catalogue row for a run. The electrodes, chip, user and customer are whatever is set at the time
+        # this is called, so call it in the GUI/CLI process when the run finishes, not in a worker process.
+        return {
+            "finished": time.time(),
+            "key": experiment_key(exp),
+            "solution": exp.solution,
+            "technique": exp.technique,
+            "block": exp.block.name,
+            "block_rows": exp.block.num_rows,
+            "block_cols": exp.block.num_cols,
+            "start_row": exp.block.start_row,
+            "start_col": exp.block.start_col,
+            "vcfg": exp.vcfg.name,
+            "scan_rate": exp.vcfg.rate,
+            "v_start": exp.vcfg.start,
+            "v_end": exp.vcfg.end,
+            "cycles": exp.vcfg.N_cycles,
+            "well": exp.gcode.name,
+            "chip": GET_CHIP(),
+            "counter": GET_COUNTER_ELECTRODE(),
+            "reference": GET_REFERENCE_ELECTRODE(),
+            "working": GET_WORKING_ELECTRODE(),
+            "user": CONFIG.get('General', 'user', fallback=""),
+            "customer": CONFIG.get('General', 'customer', fallback=""),
+            "data_file": os.path.abspath(data_file),
+            "experiment": json.dumps(exp.to_dict()),
+            "stop_reason": exp.stop_reason,
+        }
+
+    def insert(self, row):
+        with self.lock, self.db:
+            return self.db.execute(f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                                   tuple(row.values())).lastrowid
+
+    def set_error(self, run, error):
+        # Marks a registered run whose data could not be converted or analysed
+        with self.lock, self.db:
+            self.db.execute("UPDATE runs SET error = ? WHERE id = ?", (error, run))
+
+    def register(self, exp, data_file):
+        return self.insert(self.describe(exp, data_file))
+
+    def find(self, since=None, until=None, **fields):
+        # find(chip="Chip: CBMX, 12-7", block="5x5b", scan_rate=0.05) -> matching rows, newest first.
+        # Text fields match exactly, or as a LIKE pattern when they contain % or _.
+        clauses, values = [], []
+        for name, value in fields.items():
+            if name not in COLUMNS:
+                raise ValueError(f"Cannot search the catalogue by {name}, use one of {', '.join(COLUMNS)}")
+            if isinstance(value, float):
+                clauses.append(f"{name} BETWEEN ? AND ?")
+                values += [value - FLOAT_TOLERANCE, value + FLOAT_TOLERANCE]
+            elif isinstance(value, str) and ("%" in value or "_" in value):
+                clauses.append(f"{name} LIKE ?")
+                values.append(value)
+            else:
+                clauses.append(f"{name} = ?")
+                values.append(value)
+        if since is not None:
+            clauses.append("finished >= ?")
+            values.append(since)
+        if until is not None:
+            clauses.append("finished < ?")
+            values.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.db.execute(f"SELECT * FROM runs {where} ORDER BY finished DESC", values).fetchall()
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the results catalogue")
+    for column in COLUMNS:
+        parser.add_argument(f"--{column.replace('_', '-')}", type=float if column == "scan_rate" else str)
+    args = vars(parser.parse_args())
+    for run in Catalogue().find(**{name: value for name, value in args.items() if value is not None}):
+        print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(run['finished']))}  {run['solution'][:24]:<25} "
+              f"{run['block']:<8} {run['vcfg']:<8} {run['scan_rate']:<6} {run['chip']:<20} {run['data_file']}")
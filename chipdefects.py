@@ -0,0 +1,93 @@
+######################################################################################
+# Persistent record of known-bad cells for each chip
+######################################################################################
+
+import json
+import os
+import re
+
+import numpy as np
+
+from definitions import ROOT_DIR
+
+DEFECTS_DIR = os.path.join(ROOT_DIR, 'database', 'defects')
+DEAD_AFTER = 3  # Number of consecutive failed loads/tests before a cell state is treated as dead
+MAX_RETRIES = 10  # Retry limit for cells we know nothing bad about
+
+
+def chip_key(chip):
+    # "Chip: NDC-WB, 3-14, Lead 2" -> "NDC-WB_3-14_Lead_2"
+    name = chip.removeprefix("Chip:").strip()
+    return re.sub(r'[^A-Za-z0-9-]+', '_', name).strip('_')
+
+
+class DefectRegistry:
+    # Without a chip name there is nothing to tie the cells to, so nothing is recorded and nothing skipped
+    def __init__(self, chip, directory=DEFECTS_DIR):
+        self.chip = chip
+        self.path = os.path.join(directory, f"{chip_key(chip)}.json") if chip else None
+        self.cells = {}  # (row, column) -> {"failures": [per state], "retries": [per state]}
+        self.changed = False
+        self.load()
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as file:
+            data = json.load(file)
+        for cell in data["cells"]:
+            self.cells[(cell["row"], cell["column"])] = {"failures": cell["failures"], "retries": cell["retries"]}
+
+    def save(self):
+        if self.path is None or not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        cells = [{"row": row, "column": column, **stats} for (row, column), stats in sorted(self.cells.items())]
+        with open(self.path, 'w') as file:
+            json.dump({"chip": self.chip, "cells": cells}, file, indent=1)
+        self.changed = False
+
+    def is_dead(self, row, column, value):
+        cell = self.cells.get((row, column))
+        return cell is not None and cell["failures"][value] >= DEAD_AFTER
+
+    def retry_limit(self, row, column, value):
+        if self.is_dead(row, column, value):
+            return 0
+        return MAX_RETRIES
+
+    def record(self, row, column, value, success, retries=0):
+        if not self.chip:
+            return
+        cell = self.cells.get((row, column))
+        if cell is None:
+            if success and retries == 0:  # Only keep cells that have misbehaved at least once
+                return
+            cell = self.cells[(row, column)] = {"failures": [0] * 4, "retries": [0] * 4}
+
+        if success:
+            cell["failures"][value] = 0  # Cell recovered, forget previous failures for this state
+        else:
+            cell["failures"][value] += 1
+        cell["retries"][value] += retries
+        self.changed = True
+
+    def record_test(self, chipmap_in, chipmap_out):
+        for row in range(len(chipmap_in)):
+            for column in range(len(chipmap_in[row])):
+                self.record(row, column, chipmap_in[row][column], chipmap_in[row][column] == chipmap_out[row][column])
+        self.save()
+
+    def record_report(self, report):
+        # Only visit cells that failed a step or are already tracked, instead of every cell of every step
+        failures = report.failures
+        for i in range(len(report.steps)):
+            expected = report.expected[i]
+            failed = {tuple(cell) for cell in np.argwhere(failures[i]).tolist()}
+            for row, column in failed | set(self.cells):
+                self.record(row, column, int(expected[row, column]), (row, column) not in failed)
+        self.save()
+
+    def dead_cells(self):
+        return [(row, column, value) for (row, column), cell in sorted(self.cells.items())
+                for value in range(4) if cell["failures"][value] >= DEAD_AFTER]
@@ -0,0 +1,150 @@
+######################################################################################
+# Bulk self-test of the chip electrode array through the ADLINK card
+######################################################################################
+
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+ROWS = 64
+COLUMNS = 16
+STATES = 4
+
+# Address order used by the card, address = column << 6 | row
+ASCENDING = [(row, column) for column in range(COLUMNS) for row in range(ROWS)]
+DESCENDING = ASCENDING[::-1]
+
+DEFAULT_SUITE = ["solid", "checkerboard", "march", "walking", "random"]
+
+
+@dataclass
+class Step:
+    name: str
+    chipmap: np.ndarray
+    order: list = field(default_factory=lambda: ASCENDING)
+
+
+def solid_steps():
+    return [Step(f"solid {state}", np.full((ROWS, COLUMNS), state)) for state in range(STATES)]
+
+
+def checkerboard_steps():
+    parity = np.add.outer(np.arange(ROWS), np.arange(COLUMNS)) % 2
+    steps = []
+    for a, b in [(1, 2), (2, 3), (0, 3), (1, 0)]:
+        steps.append(Step(f"checkerboard {a}/{b}", np.where(parity == 0, a, b)))
+        steps.append(Step(f"checkerboard {b}/{a}", np.where(parity == 0, b, a)))
+    return steps
+
+
+def march_steps():
+    # March C- style: step every cell through each state ascending, then back down descending, so a
+    # cell that gets disturbed by writes to its neighbours shows up on the readback of the next element
+    steps = []
+    for state in [0, 1, 2, 3, 0]:
+        steps.append(Step(f"march up {state}", np.full((ROWS, COLUMNS), state), ASCENDING))
+    for state in [3, 2, 1, 0]:
+        steps.append(Step(f"march down {state}", np.full((ROWS, COLUMNS), state), DESCENDING))
+    return steps
+
+
+def walking_steps(state=2, background=0):
+    steps = []
+    for column in range(COLUMNS):
+        chipmap = np.full((ROWS, COLUMNS), background)
+        chipmap[:, column] = state
+        steps.append(Step(f"walking column {column}", chipmap))
+    for offset in range(4):
+        chipmap = np.full((ROWS, COLUMNS), background)
+        chipmap[np.arange(offset, ROWS, 4), :] = state
+        steps.append(Step(f"walking rows +{offset}", chipmap))
+    return steps
+
+
+def random_steps(count=2, seed=None):
+    rng = np.random.default_rng(seed)
+    return [Step(f"random {i}", rng.integers(0, STATES, (ROWS, COLUMNS))) for i in range(count)]
+
+
+PATTERNS = {
+    "solid": solid_steps,
+    "checkerboard": checkerboard_steps,
+    "march": march_steps,
+    "walking": walking_steps,
+    "random": random_steps,
+}
+
+
+def build_steps(patterns=None):
+    steps = []
+    for name in patterns or DEFAULT_SUITE:
+        if name not in PATTERNS:
+            raise ValueError(f"Unknown chip test pattern: {name}")
+        steps.extend(PATTERNS[name]())
+    return steps
+
+
+@dataclass
+class ChipTestReport:
+    chip: str
+    steps: list[str]
+    expected: np.ndarray  # (steps, rows, columns)
+    observed: np.ndarray
+    duration: float
+
+    @property
+    def failures(self):
+        return self.expected != self.observed
+
+    @property
+    def passed(self):
+        return not self.failures.any()
+
+    def step_failures(self):
+        return self.failures.sum(axis=(1, 2))
+
+    def cell_failure_rate(self):
+        return self.failures.mean(axis=0)
+
+    def state_failure_rate(self):
+        # Fraction of writes of each state that read back wrong, nan if the state was never written
+        written = np.bincount(self.expected.ravel(), minlength=STATES)
+        failed = np.bincount(self.expected[self.failures], minlength=STATES)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return failed / written
+
+    def confusion(self):
+        # confusion[written, read] counts over every cell of every step
+        codes = self.expected.ravel() * STATES + self.observed.ravel()
+        return np.bincount(codes, minlength=STATES * STATES).reshape(STATES, STATES)
+
+    def bad_cells(self, threshold=0.0):
+        return [tuple(cell) for cell in np.argwhere(self.cell_failure_rate() > threshold).tolist()]
+
+    def summary(self):
+        lines = [f"Chip test on {self.chip or 'unknown chip'}: {len(self.steps)} steps in {self.duration:.2f} s"]
+        for name, count in zip(self.steps, self.step_failures()):
+            lines.append(f"{name:<20} {'Passed' if count == 0 else f'Failed ({count} cells)'}")
+        rates = ", ".join(f"{state}: {rate:.2%}" for state, rate in enumerate(self.state_failure_rate()))
+        lines.append(f"Failure rate per state: {rates}")
+        lines.append(f"Cells with failures: {len(self.bad_cells())}")
+        return "\n".join(lines)
+
+
+def run_self_test(card, channel, patterns=None):
+    steps = build_steps(patterns)
+    expected = np.empty((len(steps), ROWS, COLUMNS), dtype=np.int64)
+    observed = np.empty_like(expected)
+
+    start = time.perf_counter()
+    for i, step in enumerate(steps):
+        card.write_chip_map(channel, step.chipmap, step.order)
+        expected[i] = step.chipmap
+        observed[i] = card.get_chip_map(channel)
+    duration = time.perf_counter() - start
+
+    defects = card.defects_for(channel)
+    report = ChipTestReport(defects.chip, [step.name for step in steps], expected, observed, duration)
+    defects.record_report(report)
+    return report
@@ -0,0 +1,141 @@
+######################################################################################
+# Headless batch runner: python cli.py manifest.json --working "Chip: CBMX, 12-7" --par --robot
+######################################################################################
+
+import argparse
+import sys
+import time
+
+import hardware
+import manifest
+from definitions import CONFIG, SET_COUNTER_ELECTRODE, SET_REFERENCE_ELECTRODE, SET_WORKING_ELECTRODE, \
+    SET_PAR_ENABLED, SET_ROBOT_ENABLED
+from postprocess import PostProcessor
+from queuejournal import QueueJournal
+from resultcache import ResultCache
+from scheduler import ExperimentScheduler
+
+
+class Log:
+    # Stands in for sys.stdout like DebugWindow does in the GUI, timestamps each line and copies it to a file
+    def __init__(self, stream, path=None):
+        self.stream = stream
+        self.file = open(path, 'a') if path else None
+        self.line_start = True
+
+    def write(self, text):
+        for part in text.splitlines(keepends=True):
+            if self.line_start:
+                part = time.strftime("%H:%M:%S ") + part
+            self.line_start = part.endswith("\n")
+            self.stream.write(part)
+            if self.file:
+                self.file.write(part)
+        self.flush()
+
+    def flush(self):
+        self.stream.flush()
+        if self.file:
+            self.file.flush()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run an experiment manifest without the GUI")
+    parser.add_argument("manifest", nargs="?", help="Experiment manifest file")
+    parser.add_argument("--config", help="config.ini to use instead of the one in the working directory")
+    parser.add_argument("--counter", default="", help="Counter electrode, e.g. \"Chip: CBMX, 12-7\"")
+    parser.add_argument("--reference", default="", help="Reference electrode")
+    parser.add_argument("--working", default="", help="Working electrode")
+    parser.add_argument("--robot", action="store_true", help="Enable robot control")
+    parser.add_argument("--par", action="store_true", help="Enable PAR control")
+    parser.add_argument("--log", help="Also append progress to this file")
+    parser.add_argument("--resume", action="store_true",
+                        help="Carry on with the unfinished experiments of the last campaign instead of a manifest")
+    parser.add_argument("--rerun", action="store_true", help="Run experiments even if they already have results")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="Rerun experiments whose recorded data file is missing or empty")
+    parser.add_argument("--dry-run", action="store_true", help="Load and list the queue without running it")
+    args = parser.parse_args(argv)
+    if args.manifest is None and not args.resume:
+        parser.error("a manifest is needed unless --resume is given")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.stdout = Log(sys.__stdout__, args.log)
+
+    if args.config:
+        CONFIG.read(args.config)
+    SET_COUNTER_ELECTRODE(args.counter)
+    SET_REFERENCE_ELECTRODE(args.reference)
+    SET_WORKING_ELECTRODE(args.working)
+    SET_ROBOT_ENABLED(args.robot)
+    SET_PAR_ENABLED(args.par)
+
+    journal = None
+    try:
+        entries = None
+        if args.resume:
+            journal = QueueJournal()
+            entries, experiments = journal.resume()
+            print(f"{len(experiments)} experiments left from the last campaign")
+        else:
+            experiments = manifest.load_manifest(args.manifest)
+            print(f"Loaded {len(experiments)} experiments from {args.manifest}")
+        if args.dry_run:
+            for exp in experiments:
+                print(str(exp))
+            return 0
+        journal = journal or QueueJournal()  # A dry run of a manifest leaves no trace on disk
+        return run_queue(args, experiments, entries, journal)
+    finally:
+        if journal is not None:
+            journal.close()
+
+
+def run_queue(args, experiments, entries, journal):
+    enable_adlink = hardware.adlink_enabled() and hardware.adlink_supported()
+    adlink_manager = grbl = ec_lab = None
+    postprocess = PostProcessor()
+    try:
+        if enable_adlink:
+            adlink_manager = hardware.init_adlink()
+        if args.robot:
+            grbl = hardware.init_robot()
+        if args.par:
+            ec_lab = hardware.init_par()
+
+        def measure(exp, index, output):
+            written = None
+            if ec_lab is not None:
+                written = ec_lab.cyclic_voltammetry(exp.vcfg, str(index), output)
+                exp.stop_reason = ec_lab.stop_reason
+            print(f"Experiment {index + 1}/{scheduler.queued} completed")  # Counted after the cache left some out
+            return written
+
+        scheduler = ExperimentScheduler(
+            move=(lambda exp: hardware.execute_gcode(grbl, exp.gcode, wait=True)) if grbl else None,
+            program=(lambda exp, card_num, channel: adlink_manager.card(card_num).set_chip_map(
+                channel, exp.block.chipmap())) if adlink_manager else None,
+            measure=measure,
+            sockets=adlink_manager.sockets() if adlink_manager else None,
+            cache=None if args.rerun else ResultCache(),
+            revalidate=args.revalidate,
+            journal=journal,
+            postprocess=postprocess)
+        stages = scheduler.run(experiments, entries)
+        failed = any(stage.error is not None or stage.skipped for stage in stages)
+    finally:
+        if ec_lab is not None:
+            ec_lab.release_kbio()
+        if grbl is not None:
+            grbl.disconnect()
+        if adlink_manager is not None:
+            adlink_manager.release_adlink()
+        postprocess.shutdown()  # Let queued conversions and catalogue entries finish before exiting
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+######################################################################################
+# Publish/subscribe between the GetData poller and everything that consumes its data
+######################################################################################
+
+import threading
+from collections import deque
+
+POLICIES = ("block", "drop_oldest", "coalesce")
+
+
+class Subscriber:
+    # One bounded queue and one thread per consumer. What happens when the queue is full is the policy:
+    #   block        the publisher waits for room, nothing is lost (disk writers)
+    #   drop_oldest  the oldest message goes to make room (live displays)
+    #   coalesce     only the newest message is kept (status readouts)
+    def __init__(self, name, handler, policy, maxsize):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy}, use one of {', '.join(POLICIES)}")
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.maxsize = 1 if policy == "coalesce" else maxsize
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+        self.errors = 0
+        self.error = None  # First exception the handler raised
+        self.thread = threading.Thread(target=self._run, name=f"bus-{name}", daemon=True)
+        self.thread.start()
+
+    def put(self, message):
+        with self.condition:
+            if self.policy == "block":
+                while len(self.queue) >= self.maxsize:
+                    self.condition.wait()
+            elif len(self.queue) >= self.maxsize:
+                self.queue.popleft()
+                self.dropped += 1
+            self.queue.append(message)
+            self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if not self.queue:
+                    return  # Closed and drained
+                message = self.queue.popleft()
+                self.condition.notify_all()  # Room for a blocked publisher
+            try:
+                self.handler(*message)
+            except Exception as e:
+                self.errors += 1
+                if self.errors == 1:  # Once is enough, a broken consumer would otherwise flood the log
+                    self.error = e
+                    print(f"Data bus consumer {self.name} failed: {e}")
+
+    def close(self, timeout=None):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+
+
+class DataBus:
+    # publish() hands every message to every subscriber's queue and returns, so a slow consumer only costs
+    # the poller time if it asked for the block policy and has fallen maxsize messages behind. Handlers
+    # are called with the published arguments on their own thread. close() lets every consumer drain.
+    # Block consumers are the ones that must not lose data, failed() lists those whose handler raised.
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, name, handler, policy="block", maxsize=64):
+        subscriber = Subscriber(name, handler, policy, maxsize)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def publish(self, *message):
+        for subscriber in self.subscribers:
+            subscriber.put(message)
+
+    def failed(self):
+        return [subscriber for subscriber in self.subscribers if subscriber.policy == "block" and subscriber.errors]
+
+    def close(self, timeout=None):
+        for subscriber in self.subscribers:
+            subscriber.close(timeout)
+        for subscriber in self.subscribers:
+            if subscriber.errors or (subscriber.dropped and subscriber.policy == "drop_oldest"):
+                print(f"Data bus consumer {subscriber.name}: {subscriber.dropped} dropped, "
+                      f"{subscriber.errors} failed")
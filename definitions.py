@@ -47,3 +47,9 @@ def GET_WORKING_ELECTRODE():
 def SET_WORKING_ELECTRODE(value):
     global WORKING_ELECTRODE
     WORKING_ELECTRODE = value
+
+def GET_CHIP():  # The chip chosen in ChipSelectionDialog, whichever electrode it was assigned to
+    for electrode in [COUNTER_ELECTRODE, WORKING_ELECTRODE, REFERENCE_ELECTRODE]:
+        if electrode.startswith("Chip: "):
+            return electrode
+    return ""
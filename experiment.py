@@ -1,4 +1,4 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 
 
 @dataclass
@@ -23,6 +23,13 @@ class Block:
     start_col: int
     definition: list[list[int]] = field(default_factory=list)
 
+    def chipmap(self):  # The block placed on an otherwise empty 64x16 chip
+        chipmap = [[0] * 16 for _ in range(64)]
+        for i in range(self.num_rows):
+            for j in range(self.num_cols):
+                chipmap[self.start_row + i][self.start_col + j] = self.definition[i][j]
+        return chipmap
+
 @dataclass
 class Gcode:
     name: str
@@ -35,6 +42,9 @@ class Experiment:
         self.technique: str = technique
         self.vcfg: CV = vcfg
         self.gcode: Gcode = gcode
+        self.pinned: bool = False  # Queue optimisation keeps pinned experiments where they are
+        self.repeat: int = 0  # Which run of a repeated experiment this is, 0 for the first or only one
+        self.stop_reason: str = None  # Set when a monitor stopped the measurement early
 
     def tile_block(self):
         new_start_row = self.block.start_row
@@ -51,7 +61,20 @@ class Experiment:
         self.block = Block(self.block.name, self.block.num_rows,
                                       self.block.num_cols, new_start_row, new_start_col, self.block.definition)
 
+    def to_dict(self):
+        return {"solution": self.solution, "block": asdict(self.block), "technique": self.technique,
+                "vcfg": asdict(self.vcfg), "gcode": asdict(self.gcode), "pinned": self.pinned,
+                "repeat": self.repeat}
+
+    @classmethod
+    def from_dict(cls, data):
+        exp = cls(data["solution"], Block(**data["block"]), data["technique"], CV(**data["vcfg"]),
+                  Gcode(**data["gcode"]))
+        exp.pinned = data.get("pinned", False)
+        exp.repeat = data.get("repeat", 0)
+        return exp
+
     def __str__(self):
-        return (f'{self.solution[:24]:<25} Block: {self.block.name[:6]:<7} Mode: {self.technique[:6]:<7} '
+        return (f'{"*" if self.pinned else " "}{self.solution[:24]:<25} Block: {self.block.name[:6]:<7} Mode: {self.technique[:6]:<7} '
                 f'Vcfg: {self.vcfg.name[:6]:<7} Well: {self.gcode.name[:6]:<7}')
 
@@ -0,0 +1,203 @@
+######################################################################################
+# Plans well to well robot moves and writes them as G-code files for experiments
+######################################################################################
+
+import math
+import os
+import re
+from dataclasses import dataclass
+
+from definitions import CONFIG
+
+
+@dataclass
+class Well:
+    name: str
+    x: float
+    y: float
+    z: float  # Depth to lower to, Z grows downwards on this machine and Z0 is fully raised
+
+
+@dataclass
+class MachineLimits:
+    feed: float = 1000  # mm/min for XY moves
+    z_feed: float = 1000  # mm/min for Z moves
+    acceleration: float = 50  # mm/s^2
+    safe_z: float = 0  # Absolute Z every move travels at, above every rim, whatever well it starts from
+    home_z: float = 0
+
+    @classmethod
+    def from_config(cls):
+        return cls(CONFIG.getfloat('Robot', 'feed', fallback=cls.feed),
+                   CONFIG.getfloat('Robot', 'z_feed', fallback=cls.z_feed),
+                   CONFIG.getfloat('Robot', 'acceleration', fallback=cls.acceleration),
+                   CONFIG.getfloat('Robot', 'safe_z', fallback=cls.safe_z),
+                   CONFIG.getfloat('Robot', 'home_z', fallback=cls.home_z))
+
+
+@dataclass
+class PlannedMove:
+    well: Well
+    lines: list[str]
+    seconds: float
+
+
+def move_time(distance, feed, acceleration):
+    # Trapezoidal profile from standstill to standstill, triangular if the move is too short to reach feed
+    speed = feed / 60
+    if distance <= 0:
+        return 0.0
+    if distance >= speed * speed / acceleration:
+        return distance / speed + speed / acceleration
+    return 2 * math.sqrt(distance / acceleration)
+
+
+def parse_gcode(lines, start=(0.0, 0.0, 0.0)):
+    # Yields (position, feed, dwell) for each move or dwell, following G90/G91 and modal feed rates
+    position = list(start)
+    absolute = True
+    feed = None
+    for line in lines:
+        code = line.split(';', 1)[0].upper()
+        words = dict((letter, float(value)) for letter, value in re.findall(r'([A-Z])\s*(-?[\d.]+)', code))
+        for g in re.findall(r'G\s*(\d+)', code):
+            if g == '90':
+                absolute = True
+            elif g == '91':
+                absolute = False
+            elif g == '4':
+                yield tuple(position), feed, words.get('P', 0.0)
+        if 'F' in words:
+            feed = words['F']
+        if any(axis in words for axis in 'XYZ'):
+            for i, axis in enumerate('XYZ'):
+                if axis in words:
+                    position[i] = words[axis] if absolute else position[i] + words[axis]
+            yield tuple(position), feed, 0.0
+
+
+def estimate_gcode(lines, limits, start=(0.0, 0.0, 0.0)):
+    seconds = 0.0
+    previous = start
+    for position, feed, dwell in parse_gcode(lines, start):
+        seconds += dwell
+        distance = math.dist(previous, position)
+        if distance > 0:
+            seconds += move_time(distance, feed or limits.feed, limits.acceleration)
+        previous = position
+    return seconds
+
+
+def final_position(path, start=(0.0, 0.0, 0.0)):
+    position = start
+    with open(path, 'r') as file:
+        for position, _, _ in parse_gcode(file, start):
+            pass
+    return position
+
+
+def wells_from_gcode(gcodes, gcode_dir):
+    # Where each existing experiment G-code file leaves the robot
+    return [Well(gcode.name, *final_position(os.path.join(gcode_dir, gcode.file))) for gcode in gcodes.values()]
+
+
+def clear_height(a, b, limits):
+    # Z to travel at between two wells. Always the configured safe Z, so a planned file does not depend on
+    # which well the robot was left in.
+    return limits.safe_z
+
+
+def travel_time(a, b, limits):
+    # Time to go from one well to the next with the moves plan_move makes
+    travel_z = clear_height(a, b, limits)
+    return (move_time(a.z - travel_z, limits.z_feed, limits.acceleration)
+            + move_time(math.dist((a.x, a.y), (b.x, b.y)), limits.feed, limits.acceleration)
+            + move_time(b.z - travel_z, limits.z_feed, limits.acceleration))
+
+
+def order_wells(wells, limits, start):
+    # Nearest neighbour tour from start, then 2-opt until no reversal shortens it
+    remaining = list(wells)
+    tour = []
+    current = start
+    while remaining:
+        nearest = min(remaining, key=lambda well: travel_time(current, well, limits))
+        remaining.remove(nearest)
+        tour.append(nearest)
+        current = nearest
+
+    def cost(i, j):  # Travel from tour[i] to tour[j], index -1 is the start position
+        return travel_time(start if i < 0 else tour[i], tour[j], limits)
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(tour) - 1):
+            for j in range(i + 1, len(tour)):
+                before = cost(i - 1, i) + (cost(j, j + 1) if j + 1 < len(tour) else 0)
+                after = cost(i - 1, j) + (cost(i, j + 1) if j + 1 < len(tour) else 0)
+                if after < before - 1e-9:
+                    tour[i:j + 1] = reversed(tour[i:j + 1])
+                    improved = True
+    return tour
+
+
+def plan_move(previous, well, limits):
+    # Every line is written even when the planned predecessor would make it a no-op, the file may be run
+    # from anywhere
+    travel_z = clear_height(previous, well, limits)
+    lines = ["G90 ; Set to absolute positioning",
+             f"G1 Z{travel_z + 0.0:.3f} F{limits.z_feed:g}; Lift to the safe height",
+             f"G1 X{well.x + 0.0:.3f} Y{well.y + 0.0:.3f} F{limits.feed:g}; Over {well.name}",
+             f"G1 Z{well.z + 0.0:.3f} F{limits.z_feed:g}; Into {well.name}"]
+    return PlannedMove(well, lines, travel_time(previous, well, limits))
+
+
+def plan(wells, limits=None, start=None, reorder=False):
+    limits = limits or MachineLimits.from_config()
+    start = start or Well("home", 0.0, 0.0, limits.home_z)
+    if reorder:
+        wells = order_wells(wells, limits, start)
+    planned = []
+    previous = start
+    for well in wells:
+        planned.append(plan_move(previous, well, limits))
+        previous = well
+    return planned
+
+
+PLANNED_MARKER = "; Planned move, written by gcodeplan.write_plan"
+
+
+def write_plan(planned, directory, prefix="planned_"):
+    # One file per step of the plan, numbered so a well visited twice gets two files, and picked up by
+    # fileio.from_folder next to the hand written ones. Files this function wrote before are overwritten,
+    # anything else is refused.
+    paths = [os.path.join(directory, f"{prefix}{step:03d}_{move.well.name}.gcode")
+             for step, move in enumerate(planned)]
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                if PLANNED_MARKER not in file.read():
+                    raise FileExistsError(f"{path} is not a planned move, pick another prefix or directory")
+    for path, move in zip(paths, planned):
+        with open(path, 'w') as file:
+            file.write(PLANNED_MARKER + "\n")
+            file.write("G21 ; Set units to millimeters\n")
+            file.write("\n".join(move.lines) + "\n")
+    return paths
+
+
+def report(planned, baseline=None):
+    # baseline maps well names to the estimated seconds of the file they would otherwise run
+    lines = []
+    for move in planned:
+        line = f"{move.well.name:<10} {move.seconds:6.2f} s"
+        if baseline and move.well.name in baseline:
+            line += f"  (was {baseline[move.well.name]:6.2f} s)"
+        lines.append(line)
+    total = sum(move.seconds for move in planned)
+    lines.append(f"Total motion {total:.1f} s")
+    if baseline:
+        lines.append(f"Hand written files {sum(baseline.get(move.well.name, 0) for move in planned):.1f} s")
+    return "\n".join(lines)
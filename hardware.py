@@ -0,0 +1,65 @@
+######################################################################################
+# Connects the lab devices, shared by the GUI and the headless runner (no Qt in here)
+######################################################################################
+
+import os
+import platform
+
+from definitions import ROOT_DIR, CONFIG, GET_COUNTER_ELECTRODE, GET_REFERENCE_ELECTRODE, GET_WORKING_ELECTRODE, \
+    GET_CHIP
+from motion import MOTION
+from timeline import TIMELINE
+
+
+def grbl_callback(eventstring, *data):
+    args = []
+    for d in data:
+        args.append(str(d))
+    print("GRBL CALLBACK: event={} data={}".format(eventstring.ljust(30), ", ".join(args)))
+    MOTION.handle(eventstring, *data)
+
+def adlink_enabled():  # Only CBMX chips are driven through the ADLINK card
+    return any(electrode.startswith("Chip: CBMX") for electrode in
+               [GET_COUNTER_ELECTRODE(), GET_WORKING_ELECTRODE(), GET_REFERENCE_ELECTRODE()])
+
+def adlink_supported():  # No ADLINK or EC-Lab drivers on macOS
+    return platform.system() != 'Darwin'
+
+def init_adlink():
+    from adlink import AdlinkManager
+    adlink_manager = AdlinkManager(GET_CHIP())
+    print("DEBUG MESSAGE: Adlink Cards Initialized")
+    return adlink_manager
+
+def init_par():
+    from par import PAR
+    kbio_port = CONFIG.get('Ports', 'par_port')
+    ec_lab = PAR(kbio_port)
+    print("DEBUG MESSAGE: EC-Lab PAR Initialized")
+    return ec_lab
+
+def init_robot():
+    from grbl_streamer import GrblStreamer
+    grbl = GrblStreamer(grbl_callback)
+    grbl.setup_logging()
+    grbl_port = CONFIG.get('Ports', 'robot_port')
+    grbl.cnect(grbl_port, 115200)
+    print("DEBUG MESSAGE: GRBL Connected")
+    try:
+        MOTION.wait_boot(timeout=5)  # Let grbl connect
+    except TimeoutError:
+        print("DEBUG MESSAGE: No GRBL boot message, continuing")
+    grbl.poll_start()  # Status reports drive MOTION's idle and position tracking
+    grbl.killalarm()  # Turn off alarm on startup
+    print("DEBUG MESSAGE: GRBL Alarm Turned off")
+    return grbl
+
+def execute_gcode(grbl, gcode, wait=False):
+    gcode_dir = os.path.join(ROOT_DIR, 'gcode', gcode.file)
+    grbl.load_file(gcode_dir)
+    MOTION.start_job()
+    TIMELINE.record("gcode", name=gcode.name, file=gcode.file)
+    grbl.job_run()
+    if wait:
+        MOTION.wait_job_done(timeout=CONFIG.getfloat('Robot', 'motion_timeout', fallback=120))
+        TIMELINE.record("gcode_done", name=gcode.name, file=gcode.file)
@@ -0,0 +1,158 @@
+######################################################################################
+# Equivalent circuit fitting of impedance spectra, many electrodes at once
+######################################################################################
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from definitions import CONFIG
+from kbio.tech_types import TECH_ID
+from rawarchive import RawArchive
+
+# Parameters are fitted as logs so they stay positive, except the CPE exponent n which goes through a
+# logistic so it stays between 0 and 1.
+
+
+def randles(w, p):
+    # Rs + (Cdl || (Rct + Warburg)), p columns Rs, Rct, Cdl, sigma
+    rs, rct, cdl, sigma = (p[:, i:i + 1] for i in range(4))
+    warburg = sigma * (1 - 1j) / np.sqrt(w)
+    return rs + 1 / (1j * w * cdl + 1 / (rct + warburg))
+
+
+def r_cpe(w, p):
+    # Rs + (R || CPE), p columns Rs, R, Q, n
+    rs, r, q, n = (p[:, i:i + 1] for i in range(4))
+    return rs + r / (1 + r * q * (1j * w) ** n)
+
+
+@dataclass
+class Circuit:
+    name: str
+    model: callable
+    parameters: tuple
+    exponents: tuple = ()  # Parameters between 0 and 1
+
+
+CIRCUITS = {
+    "randles": Circuit("randles", randles, ("Rs", "Rct", "Cdl", "sigma")),
+    "r-cpe": Circuit("r-cpe", r_cpe, ("Rs", "R", "Q", "n"), ("n",)),
+}
+
+
+@dataclass
+class FitResult:
+    circuit: str
+    parameters: tuple
+    values: np.ndarray  # (electrodes, parameters)
+    rmse: np.ndarray  # Relative to |Z|, per electrode
+    converged: np.ndarray
+
+
+def to_values(circuit, theta):
+    values = np.exp(theta)
+    for name in circuit.exponents:
+        i = circuit.parameters.index(name)
+        values[:, i] = 1 / (1 + np.exp(-theta[:, i]))
+    return values
+
+
+def to_theta(circuit, values):
+    theta = np.log(values)
+    for name in circuit.exponents:
+        i = circuit.parameters.index(name)
+        theta[:, i] = np.log(values[:, i] / (1 - values[:, i]))
+    return theta
+
+
+def initial_guess(circuit, w, z):
+    # Rs from the high frequency end, the arc width from the largest real part, the capacitance from the
+    # frequency at the top of the arc (w = 1 / RC)
+    rs = np.clip(z.real.min(axis=1), 1e-6, None)
+    r = np.clip(z.real.max(axis=1) - rs, 1e-6, None)
+    top = np.take_along_axis(w, (-z.imag).argmax(axis=1)[:, None], axis=1)[:, 0]
+    c = 1 / (top * r)
+    if circuit.name == "randles":
+        sigma = 0.1 * r * np.sqrt(w.min(axis=1))
+        return np.column_stack((rs, r, c, sigma))
+    return np.column_stack((rs, r, c, np.full_like(rs, 0.9)))
+
+
+def residuals(circuit, w, z, theta):
+    # Real and imaginary errors relative to |Z|, so every frequency counts the same. Wild trial steps can
+    # overflow, they come out as inf/nan and get rejected.
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        error = (circuit.model(w, to_values(circuit, theta)) - z) / np.abs(z)
+    return np.concatenate((error.real, error.imag), axis=1)
+
+
+def fit(circuit, freq, z, iterations=100, tolerance=1e-10):
+    # Levenberg-Marquardt on every spectrum at once. freq is (frequencies,) or (electrodes, frequencies),
+    # z is complex (electrodes, frequencies). Each electrode keeps its own damping.
+    circuit = CIRCUITS[circuit] if isinstance(circuit, str) else circuit
+    z = np.atleast_2d(z).astype(np.complex128)
+    w = np.broadcast_to(2 * np.pi * np.asarray(freq, dtype=np.float64), z.shape)
+    theta = to_theta(circuit, initial_guess(circuit, w, z))
+    count, size = theta.shape
+    damping = np.full(count, 1e-3)
+    r = residuals(circuit, w, z, theta)
+    cost = (r ** 2).sum(axis=1)
+    converged = np.zeros(count, bool)
+    step = 1e-6
+    for _ in range(iterations):
+        jacobian = np.stack([(residuals(circuit, w, z, theta + step * np.eye(size)[i]) - r) / step
+                             for i in range(size)], axis=2)
+        jtj = jacobian.transpose(0, 2, 1) @ jacobian
+        gradient = (jacobian.transpose(0, 2, 1) @ r[:, :, None])[:, :, 0]
+        scaled = jtj + damping[:, None, None] * (jtj * np.eye(size) + 1e-12 * np.eye(size))
+        delta = np.linalg.solve(scaled, -gradient[:, :, None])[:, :, 0]
+        trial = theta + delta
+        trial_r = residuals(circuit, w, z, trial)
+        trial_cost = (trial_r ** 2).sum(axis=1)
+        better = np.isfinite(trial_cost) & (trial_cost < cost)
+        converged |= better & (cost - trial_cost < tolerance * np.maximum(cost, 1e-30))
+        theta[better], r[better], cost[better] = trial[better], trial_r[better], trial_cost[better]
+        damping = np.where(better, damping / 3, damping * 4)
+        converged |= damping > 1e10  # No step helps any more, we are at the bottom
+        if converged.all():
+            break
+    return FitResult(circuit.name, circuit.parameters, to_values(circuit, theta),
+                     np.sqrt(cost / (2 * z.shape[1])), converged)
+
+
+def _fit_chunk(args):
+    return fit(*args)
+
+
+def fit_batch(circuit, freq, z, workers=None, chunk=256):
+    # Splits the electrodes across a process pool, [Impedance] workers (0 for one per core) by default
+    z = np.atleast_2d(z)
+    workers = workers or CONFIG.getint('Impedance', 'workers', fallback=0) or os.cpu_count() or 1
+    if workers == 1 or len(z) <= chunk:
+        return fit(circuit, freq, z)
+    freq = np.broadcast_to(np.asarray(freq), z.shape)
+    jobs = [(circuit, freq[i:i + chunk], z[i:i + chunk]) for i in range(0, len(z), chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_fit_chunk, jobs))
+    return FitResult(parts[0].circuit, parts[0].parameters, np.concatenate([part.values for part in parts]),
+                     np.concatenate([part.rmse for part in parts]), np.concatenate([part.converged for part in parts]))
+
+
+def load_spectra(paths, technique=TECH_ID.PEIS):
+    # Frequencies and impedances from one raw archive per electrode, all sweeps need the same frequencies
+    spectra = [RawArchive(path).decode(technique) for path in paths]
+    freq = np.array([spectrum["freq"] for spectrum in spectra])
+    if not np.allclose(freq, freq[0], rtol=1e-4):
+        raise ValueError("The archives were measured at different frequencies, fit them separately")
+    return freq[0], np.array([spectrum["Z"] for spectrum in spectra])
+
+
+def fit_archives(paths, circuit="randles", technique=TECH_ID.PEIS, workers=None):
+    # Returns {path: {parameter: value, "rmse": ..., "converged": ...}}
+    freq, z = load_spectra(paths, technique)
+    result = fit_batch(circuit, freq, z, workers)
+    return {path: dict(zip(result.parameters, values.tolist()), rmse=float(rmse), converged=bool(converged))
+            for path, values, rmse, converged in zip(paths, result.values, result.rmse, result.converged)}
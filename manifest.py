@@ -0,0 +1,224 @@
+######################################################################################
+# Loads experiment queues from manifest files that name blocks, vcfgs and gcode
+######################################################################################
+#
+# TOML example (JSON takes the same structure, CSV takes one entry per row):
+#
+#   [defaults]
+#   vcfg = "test"
+#   gcode = "A1"
+#
+#   [[experiments]]
+#   solution = "KCl 0.1 M"
+#   block = "5x5"
+#   gcode = ["A1", "A2", "A3"]                 # Lists expand into one experiment per value
+#   tile = 4                                   # 4 experiments, each block tiled on from the last
+#   repeat = 2                                 # Run everything above twice
+#   cv = { rate = { start = 0.01, stop = 0.1, num = 4 }, N_cycles = [2, 5] }   # vcfg overrides
+#
+#   [[experiments]]
+#   block = "5x5"
+#   sweep = { method = "lhs", points = 50, seed = 1, axes = { rate = [0.01, 0.2], start_col = [0, 11] } }
+#
+# List valued fields expand as a full grid. Ranges are {start, stop, num} (inclusive, evenly spaced)
+# or {start, stop, step}. CSV cells hold lists separated by ";" and cv overrides as cv.<field> columns.
+# A sweep runs sweep.sweep on every experiment the entry expands to, see sweep.py for the methods.
+
+import ast
+import copy
+import csv
+import dataclasses
+import itertools
+import json
+import os
+import tomllib
+
+import experiment
+import fileio
+import sweep
+from definitions import ROOT_DIR
+
+FIELDS = ["solution", "block", "technique", "vcfg", "gcode", "tile", "repeat", "cv", "sweep"]
+CV_FIELDS = {f.name: f.type for f in dataclasses.fields(experiment.CV) if f.name != "name"}
+MAX_ERRORS = 20
+
+
+def load_library(root=ROOT_DIR):
+    return {
+        "blocks": fileio.from_folder(os.path.join(root, 'blocks'), '.block'),
+        "vcfgs": fileio.from_folder(os.path.join(root, 'vcfgs', 'cv'), '.cv.vcfg'),
+        "gcode": fileio.from_folder(os.path.join(root, 'gcode'), '.gcode'),
+    }
+
+
+def read_manifest(path):
+    # Returns (defaults, entries) as plain dicts, whatever the file format
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".toml":
+        with open(path, 'rb') as file:
+            data = tomllib.load(file)
+    elif extension == ".json":
+        with open(path, 'r') as file:
+            data = json.load(file)
+    elif extension == ".csv":
+        with open(path, 'r', newline='') as file:
+            data = {"experiments": [csv_entry(row) for row in csv.DictReader(file)]}
+    else:
+        raise ValueError(f"Unsupported manifest type: {extension}")
+
+    if isinstance(data, list):
+        return {}, data
+    return data.get("defaults", {}), data.get("experiments", [])
+
+
+def csv_value(text):
+    values = [part.strip() for part in text.split(';')]
+    parsed = []
+    for value in values:
+        try:
+            parsed.append(ast.literal_eval(value))
+        except (ValueError, SyntaxError):
+            parsed.append(value)
+    return parsed[0] if len(parsed) == 1 else parsed
+
+
+def csv_entry(row):
+    entry = {}
+    for key, text in row.items():
+        if key is None or text is None or text.strip() == "":
+            continue
+        if key.startswith("cv."):
+            entry.setdefault("cv", {})[key[3:]] = csv_value(text)
+        else:
+            entry[key] = csv_value(text)
+    return entry
+
+
+def expand_values(value):
+    # A scalar, a list of values or a range dict, always returned as a list. Raises ValueError for a range
+    # that cannot be expanded.
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict):
+        if "start" not in value or "stop" not in value or ("num" in value) == ("step" in value):
+            raise ValueError(f"range {value} needs start, stop and one of num or step")
+        start, stop = value["start"], value["stop"]
+        if "num" in value:
+            num = positive_int(value["num"], "num")
+            if num == 1:
+                return [start]
+            return [start + (stop - start) * i / (num - 1) for i in range(num)]
+        step = value["step"]
+        if not isinstance(step, (int, float)) or step <= 0:
+            raise ValueError(f"step must be a positive number, not {step!r}")
+        count = int(round(abs(stop - start) / step)) + 1
+        step = step if stop >= start else -step
+        return [start + step * i for i in range(count)]
+    return [value]
+
+
+def positive_int(value, field):
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"{field} must be a positive whole number, not {value!r}")
+    return value
+
+
+class ManifestLoader:
+    def __init__(self, library=None):
+        self.library = library or load_library()
+        self.variants = sweep.CVVariants()
+
+    def expand(self, number, entry, defaults, errors):
+        entry = {**defaults, **entry}
+        unknown = set(entry) - set(FIELDS)
+        if unknown:
+            errors.append(f"experiment {number}: unknown field(s) {', '.join(sorted(unknown))}")
+            return []
+        for field in ("block", "vcfg", "gcode"):
+            if field not in entry:
+                errors.append(f"experiment {number}: no {field} given")
+                return []
+
+        choices = {}
+        try:
+            for field, library in (("block", "blocks"), ("vcfg", "vcfgs"), ("gcode", "gcode")):
+                names = expand_values(entry[field])
+                missing = [name for name in names if not isinstance(name, str) or name not in self.library[library]]
+                if missing:
+                    errors.append(f"experiment {number}: unknown {field} {', '.join(map(str, missing))}")
+                    return []
+                choices[field] = [self.library[library][name] for name in names]
+            choices["solution"] = expand_values(entry.get("solution", ""))
+            choices["technique"] = expand_values(entry.get("technique", "CV"))
+            tile = positive_int(entry.get("tile", 1), "tile")
+            repeat = positive_int(entry.get("repeat", 1), "repeat")
+        except ValueError as e:
+            errors.append(f"experiment {number}: {e}")
+            return []
+
+        overrides = entry.get("cv", {})
+        bad = [name for name in overrides if name not in CV_FIELDS]
+        if bad:
+            errors.append(f"experiment {number}: unknown cv field(s) {', '.join(bad)}")
+            return []
+        cv_names = list(overrides)
+        try:
+            cv_values = [[CV_FIELDS[name](value) for value in expand_values(overrides[name])] for name in cv_names]
+        except (TypeError, ValueError, KeyError) as e:
+            errors.append(f"experiment {number}: bad cv override ({e})")
+            return []
+
+        experiments = []
+        for solution, block, technique, vcfg, gcode in itertools.product(
+                choices["solution"], choices["block"], choices["technique"], choices["vcfg"], choices["gcode"]):
+            for values in itertools.product(*cv_values):
+                cv = self.variants.get(vcfg, dict(zip(cv_names, values)))
+                tiled = [experiment.Experiment(str(solution), block, technique, cv, gcode)]
+                for _ in range(tile - 1):
+                    exp = experiment.Experiment(str(solution), tiled[-1].block, technique, cv, gcode)
+                    exp.tile_block()
+                    if (exp.block.start_row, exp.block.start_col) == (tiled[-1].block.start_row,
+                                                                      tiled[-1].block.start_col):
+                        errors.append(f"experiment {number}: block {block.name} only fits {len(tiled)} tiles")
+                        return []
+                    tiled.append(exp)
+                experiments.extend(tiled)
+
+        if "sweep" in entry:
+            design = entry["sweep"]
+            if not isinstance(design, dict) or not isinstance(design.get("axes"), dict):
+                errors.append(f"experiment {number}: sweep needs a table with method and axes")
+                return []
+            try:
+                method = design.get("method", "grid")
+                axes = design["axes"]
+                if method == "grid":
+                    axes = {name: expand_values(values) for name, values in axes.items()}
+                experiments = [point for exp in experiments
+                               for point in sweep.sweep(exp, axes, method,
+                                                        design.get("points"), design.get("seed"), self.variants)]
+            except (ValueError, KeyError, TypeError) as e:
+                errors.append(f"experiment {number}: bad sweep ({e})")
+                return []
+        repeats = []
+        for run in range(1, repeat):
+            for exp in experiments:
+                repeats.append(copy.copy(exp))
+                repeats[-1].repeat = run  # Keeps the result cache from taking one run for all of them
+        return experiments + repeats
+
+    def load(self, path):
+        defaults, entries = read_manifest(path)
+        errors = []
+        experiments = []
+        for number, entry in enumerate(entries, 1):
+            experiments.extend(self.expand(number, entry, defaults, errors))
+        if errors:
+            shown = "\n".join(errors[:MAX_ERRORS])
+            more = f"\n... and {len(errors) - MAX_ERRORS} more" if len(errors) > MAX_ERRORS else ""
+            raise ValueError(f"{path}: {len(errors)} problem(s) in manifest\n{shown}{more}")
+        return experiments
+
+
+def load_manifest(path, library=None):
+    return ManifestLoader(library).load(path)
@@ -0,0 +1,96 @@
+######################################################################################
+# Rules checked on every poll that stop a technique early when the run is clearly bad (or done)
+######################################################################################
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from definitions import CONFIG
+from timeline import TIMELINE
+
+
+@dataclass
+class Threshold:
+    # Stops when |field| goes over limit, field being a CurrentValues field with a decoded column of the same
+    # name (I, Ewe). A shorted electrode shows up here within one poll.
+    field: str
+    limit: float
+
+    def check(self, current_values, data_info, columns, analysis):
+        peak = abs(getattr(current_values, self.field))
+        if len(columns.get(self.field, ())):
+            peak = max(peak, float(np.abs(columns[self.field]).max()))
+        if peak > self.limit:
+            return f"|{self.field}| {peak:.3g} over limit {self.limit:.3g}"
+
+
+@dataclass
+class OverflowFlags:
+    # Stops when the instrument reports current or potential overflow, or saturation, for polls polls in a row
+    polls: int = 2
+    count: int = 0
+
+    def check(self, current_values, data_info, columns, analysis):
+        flags = [name for name in ("Ioverflow", "Eoverflow", "Saturation") if getattr(current_values, name)]
+        self.count = self.count + 1 if flags else 0
+        if self.count >= self.polls:
+            return f"{', '.join(flags)} for {self.count} polls"
+
+
+@dataclass
+class CycleConvergence:
+    # Stops once the last cycles repeat each other: peak potentials within potential (V) and peak
+    # currents within current (relative) over the last cycles pairs of cycles. Needs the StreamingCVAnalyzer.
+    cycles: int = 2
+    potential: float = 0.002
+    current: float = 0.02
+
+    def check(self, current_values, data_info, columns, analysis):
+        if analysis is None or len(analysis.cycles) < self.cycles + 1:
+            return None
+        recent = analysis.cycles[-self.cycles - 1:]
+        for a, b in zip(recent, recent[1:]):
+            if abs(b.Epa - a.Epa) > self.potential or abs(b.Epc - a.Epc) > self.potential:
+                return None
+            if abs(b.Ipa - a.Ipa) > self.current * abs(a.Ipa) or abs(b.Ipc - a.Ipc) > self.current * abs(a.Ipc):
+                return None
+        return f"converged after {len(analysis.cycles)} cycles"
+
+
+def rules_from_config():
+    # [Monitors] current_limit (A), potential_limit (V), overflow_polls, converge_cycles; 0 turns a rule off
+    rules = []
+    if CONFIG.getfloat('Monitors', 'current_limit', fallback=0):
+        rules.append(Threshold("I", CONFIG.getfloat('Monitors', 'current_limit')))
+    if CONFIG.getfloat('Monitors', 'potential_limit', fallback=0):
+        rules.append(Threshold("Ewe", CONFIG.getfloat('Monitors', 'potential_limit')))
+    if CONFIG.getint('Monitors', 'overflow_polls', fallback=2):
+        rules.append(OverflowFlags(CONFIG.getint('Monitors', 'overflow_polls', fallback=2)))
+    if CONFIG.getint('Monitors', 'converge_cycles', fallback=0):
+        rules.append(CycleConvergence(CONFIG.getint('Monitors', 'converge_cycles'),
+                                      CONFIG.getfloat('Monitors', 'converge_potential', fallback=0.002),
+                                      CONFIG.getfloat('Monitors', 'converge_current', fallback=0.02)))
+    return rules
+
+
+class Monitor:
+    # Acquisition listener that runs every rule on each poll. The first rule to give a reason calls stop()
+    # once, the channel then drains and reports STOP as usual, so whatever was measured is still written.
+    def __init__(self, rules, stop, analysis=None):
+        self.rules = rules
+        self.stop = stop
+        self.analysis = analysis
+        self.reason = None
+
+    def check(self, current_values, data_info, columns):
+        if self.reason is not None:
+            return
+        for rule in self.rules:
+            reason = rule.check(current_values, data_info, columns, self.analysis)
+            if reason is not None:
+                self.reason = reason
+                print(f"> stopping early: {reason}")
+                TIMELINE.record("technique_abort", reason=reason)
+                self.stop()
+                return
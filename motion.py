@@ -0,0 +1,83 @@
+######################################################################################
+# Tracks GRBL acknowledgements and status reports so callers can wait for real motion completion
+######################################################################################
+
+import threading
+import time
+
+
+class MotionError(RuntimeError):
+    pass
+
+
+class MotionTracker:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.booted = False
+        self.state = "Unknown"  # Idle, Run, Hold, Jog, Alarm, ...
+        self.mpos = (0.0, 0.0, 0.0)
+        self.wpos = (0.0, 0.0, 0.0)
+        self.status_count = 0  # Number of status reports seen, to tell fresh reports from stale ones
+        self.job_running = False
+        self.job_acked_at = None  # status_count when the last line of the job was acknowledged
+        self.error = None
+
+    def handle(self, event, *data):
+        # Fed every GrblStreamer callback
+        with self.cond:
+            if event == "on_boot":
+                self.booted = True
+            elif event == "on_stateupdate":
+                self.state, self.mpos, self.wpos = data[0], tuple(data[1]), tuple(data[2])
+                self.status_count += 1
+            elif event == "on_job_completed":
+                self.job_acked_at = self.status_count
+            elif event in ("on_error", "on_alarm"):
+                self.error = ", ".join(str(d) for d in data)
+            elif event == "on_disconnected":
+                self.error = "GRBL disconnected"
+            else:
+                return
+            self.cond.notify_all()
+
+    def start_job(self):
+        with self.cond:
+            self.job_running = True
+            self.job_acked_at = None
+            self.error = None
+
+    def _wait(self, predicate, timeout, what):
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while not predicate():
+                if self.error is not None:
+                    raise MotionError(f"{what} failed: {self.error}")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"{what} timed out after {timeout} s (state {self.state}, position {self.mpos})")
+                self.cond.wait(remaining)
+
+    def wait_boot(self, timeout=5):
+        self._wait(lambda: self.booted, timeout, "GRBL boot")
+
+    def wait_job_done(self, timeout=120):
+        # Every line acknowledged only means the planner has it, the job is done once a status report
+        # taken after that says the machine is Idle
+        def done():
+            return (self.job_acked_at is not None and self.status_count > self.job_acked_at
+                    and self.state == "Idle")
+        self._wait(done, timeout, "G-code job")
+        with self.cond:
+            self.job_running = False
+
+    def wait_at_position(self, x=None, y=None, z=None, tolerance=0.01, timeout=120):
+        target = (x, y, z)
+        start = self.status_count
+
+        def arrived():
+            return self.status_count > start and self.state == "Idle" and all(
+                goal is None or abs(pos - goal) <= tolerance for pos, goal in zip(self.mpos, target))
+        self._wait(arrived, timeout, f"Move to {target}")
+
+
+MOTION = MotionTracker()
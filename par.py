@@ -1,18 +1,24 @@
 import os
 import sys
-import time
+from dataclasses import astuple
 
 from kbio.kbio_api import KBIO_api
 from kbio.kbio_tech import ECC_parm
-from kbio.kbio_tech import get_experiment_data
-from kbio.kbio_tech import get_info_data
 from kbio.kbio_tech import make_ecc_parm
 from kbio.kbio_tech import make_ecc_parms
+from acquisition import acquire
+from analysis import StreamingCVAnalyzer
+from databus import DataBus
+from monitors import Monitor, rules_from_config
+from timeline import TIMELINE, now
 
 class PAR:
     def __init__(self, address):
         self.api = KBIO_api(os.path.join(os.path.dirname(__file__), "lib", "kbio", "EClib64.dll"))  # Init self.api
         self.channel = 5 # TODO: GENERALIZE LATER
+        self.ecc_cache = {}  # CV values -> EccParams, see compile_cv
+        self.analysis = None
+        self.stop_reason = None  # Why the last run was stopped early, None if it ran to the end
 
         self.id, device_info = self.api.Connect(address)   # BL_Connect
         print(f"> device[{address}] info :")
@@ -34,16 +40,21 @@ class PAR:
             print("> kernel must be loaded in order to run the experiment")
             sys.exit(-1)
 
-    def cyclic_voltammetry(self, cv, index):
-        vs_init = cv.vs_init
-        v_step = cv.v_step
-        scan_rate = cv.scan_rate
+    def compile_cv(self, cv):
+        # Builds the EccParams for a CV config once, sweeps and repeated configs reuse them
+        key = astuple(cv)[1:]  # The name doesn't change what the instrument runs
+        if key in self.ecc_cache:
+            return self.ecc_cache[key]
+
+        vs_init = [False] * 5  # All potentials vs the reference, not vs the initial potential
+        v_step = [cv.start, cv.end, cv.E2, cv.start, cv.Ef]  # Ei, E1, E2, Ei, Ef
+        scan_rate = [cv.rate] * 5
         scan_number = 2 # constant according to manual, can change later
-        record_de = cv.record_de
-        average_de = cv.average_de
-        n_cycles = cv.n_cycles
-        begin_i = cv.begin_i
-        end_i = cv.end_i
+        record_de = cv.step
+        average_de = False
+        n_cycles = cv.N_cycles
+        begin_i = cv.begin_measuring_I
+        end_i = cv.End_measuring_I
 
         cv_parms = {
             "vs_initial": ECC_parm("vs_initial", bool),
@@ -75,36 +86,46 @@ class PAR:
         p_end = make_ecc_parm(self.api, cv_parms["End_measuring_I"], end_i)
         ecc_parms = make_ecc_parms(self.api, *p_steps, p_scan_num,
                                    p_record, p_average, p_cycles, p_begin, p_end)
+        self.ecc_cache[key] = ecc_parms
+        return ecc_parms
+
+    def cyclic_voltammetry(self, cv, index, output=None, bus=None):
+        ecc_parms = self.compile_cv(cv)
 
         self.api.LoadTechnique(self.id, self.channel, "cv.ecc", ecc_parms, first=True, last=True, display=False)
 
+        before = now()
         self.api.StartChannel(self.id, self.channel)
+        TIMELINE.record("technique_start", t=before, technique="CV", channel=self.channel, index=index)
 
         # experiment loop # TODO: FIX PRINTING
-        filename = "cv" + index
-        csvfile = open(f"{filename}.csv", "w")
-        csvfile.write("t (s),I (A)\n")
-        count = 0
+        filename = output or "cv" + index
         print("Reading data")
-        while True:
-            # BL_GetData
-            data = self.api.GetData(self.id, self.channel)
-            status, tech_name = get_info_data(self.api, data)
-            print(".")
-
-            for output in get_experiment_data(self.api, data, tech_name, self.board_type):
-                csvfile.write(f"{output}")
-                count += 1
-
-            if status == "STOP":
-                break
-
-            time.sleep(1)
-
-        csvfile.close()
+        self.analysis = StreamingCVAnalyzer()  # Kept so callers can read the last run's cycle metrics
+        monitor = Monitor(rules_from_config(), lambda: self.api.StopChannel(self.id, self.channel), self.analysis)
+
+        def analyse(current_values, data_info, columns):  # One consumer, the monitors read the analysis
+            self.analysis.feed(current_values, data_info, columns)
+            monitor.check(current_values, data_info, columns)
+
+        bus = bus or DataBus()
+        bus.subscribe("analysis", analyse, "block")
+        try:
+            count = acquire(self.api, self.id, self.channel, self.board_type, filename, bus=bus)
+        except BaseException:
+            self.api.StopChannel(self.id, self.channel)  # Don't leave the channel running unattended
+            raise
+        TIMELINE.record("technique_stop", technique="CV", channel=self.channel, index=index)
         print()
         print(f"> {count} data have been written into {filename}.csv")
+        self.stop_reason = monitor.reason
+        self.analysis.finish()
+        self.analysis.save(f"{filename}.analysis.json", stop_reason=self.stop_reason)
+        for cycle in self.analysis.cycles:
+            print(f"> cycle {cycle.cycle}: Epa {cycle.Epa:.3f} V Ipa {cycle.Ipa:.3e} A, "
+                  f"Epc {cycle.Epc:.3f} V Ipc {cycle.Ipc:.3e} A, Q {cycle.charge:.3e} C")
         print("> experiment done")
+        return f"{filename}.csv"
 
     def release_kbio(self):
         self.api.Disconnect(self.id)        # BL_Disconnect
@@ -0,0 +1,77 @@
+######################################################################################
+# Post-processing of finished runs in worker processes, away from the hardware threads
+######################################################################################
+
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analysis import StreamingCVAnalyzer
+from catalogue import Catalogue
+from definitions import CONFIG
+from rawarchive import RawArchive
+
+
+def process_run(data_file, row, catalogue_path):
+    # Runs in a worker process: registers the run, then decodes the raw archive into <stem>.npz and analyses
+    # it if the run did not leave an analysis behind. The run is catalogued before anything that can fail,
+    # a conversion error is written on its row and raised. Everything it needs comes in as plain values.
+    catalogue = Catalogue(catalogue_path)
+    try:
+        run = catalogue.insert(row)
+        try:
+            convert_run(data_file, row)
+        except Exception as e:
+            catalogue.set_error(run, f"{type(e).__name__}: {e}")
+            raise
+        return run
+    finally:
+        catalogue.close()
+
+
+def convert_run(data_file, row):
+    stem = os.path.splitext(data_file)[0]
+    if os.path.exists(stem + ".kbraw"):
+        columns = RawArchive(stem + ".kbraw").decode()
+        if columns:
+            np.savez_compressed(stem + ".npz", **columns)
+            if not os.path.exists(stem + ".analysis.json"):
+                analysis = StreamingCVAnalyzer()
+                analysis.feed(None, None, columns)
+                analysis.finish()
+                analysis.save(stem + ".analysis.json", stop_reason=row.get("stop_reason"))
+
+
+class PostProcessor:
+    # submit() hands a finished run to the pool and returns straight away unless backlog runs are already
+    # waiting, in which case it blocks until one finishes, so a slow disk cannot pile up work without limit.
+    # Failures are printed and kept in errors rather than raised on the thread that submitted them.
+    def __init__(self, workers=None, backlog=None, catalogue_path=None):
+        # [PostProcess] workers and backlog, 0 means one worker per core but one and twice the workers
+        workers = workers or CONFIG.getint('PostProcess', 'workers', fallback=0) or max(1, (os.cpu_count() or 2) - 1)
+        backlog = backlog or CONFIG.getint('PostProcess', 'backlog', fallback=0) or 2 * workers
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(backlog)
+        self.catalogue_path = catalogue_path or Catalogue.default_path()  # Workers need it spelled out
+        self.errors = []  # (data file, traceback text)
+
+    def submit(self, exp, data_file):
+        row = Catalogue.describe(exp, data_file)  # Needs this process's electrodes and chip
+        self.slots.acquire()
+        future = self.pool.submit(process_run, data_file, row, self.catalogue_path)
+        future.add_done_callback(lambda done: self._finished(done, data_file))
+        return future
+
+    def _finished(self, future, data_file):
+        self.slots.release()
+        error = future.exception()
+        if error is not None:
+            text = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+            self.errors.append((data_file, text))
+            print(f"Post-processing {data_file} failed: {error}")
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
@@ -0,0 +1,122 @@
+######################################################################################
+# Persistent experiment queue, so a crash part way through a campaign can be resumed
+######################################################################################
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from definitions import CONFIG
+from experiment import Experiment
+from resultcache import results_dir
+
+STATES = ("pending", "staging", "running", "done", "failed")
+LEFT = "state != 'done' AND (state != 'failed' OR attempts < ?)"  # Entries a resume would still run
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    campaign INTEGER NOT NULL REFERENCES campaigns(id),
+    position INTEGER NOT NULL,
+    experiment TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    output TEXT,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_campaign ON entries (campaign, position);
+"""
+
+
+class QueueJournal:
+    # Every state change is committed before the work it describes starts, with synchronous=FULL so a
+    # power cut cannot lose it. Each attempt at a measurement writes to its own file, named after the
+    # campaign, queue position and attempt, so neither a resume nor a new campaign overwrites old data.
+    def __init__(self, path=None):
+        path = path or os.path.join(results_dir(), "queue.sqlite")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.directory = os.path.dirname(path)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)  # Scheduler stages report from their own threads
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        self.max_attempts = CONFIG.getint('Results', 'max_attempts', fallback=3)
+
+    def start(self, experiments):
+        # New campaign with every experiment pending, returns the entry ids in queue order
+        with self.lock, self.db:
+            campaign = self.db.execute("INSERT INTO campaigns (created) VALUES (?)", (time.time(),)).lastrowid
+            return [self.db.execute(
+                "INSERT INTO entries (campaign, position, experiment, state, updated) VALUES (?, ?, ?, ?, ?)",
+                (campaign, position, json.dumps(exp.to_dict()), "pending", time.time())).lastrowid
+                    for position, exp in enumerate(experiments)]
+
+    def unfinished(self):
+        # The most recent campaign if it still has work left, or None. Older campaigns are never picked up
+        # again, and an entry that has failed [Results] max_attempts times no longer counts as work left.
+        campaign = self.db.execute("SELECT MAX(id) FROM campaigns").fetchone()[0]
+        if campaign is None:
+            return None
+        left = self.db.execute(f"SELECT COUNT(*) FROM entries WHERE campaign = ? AND {LEFT}",
+                               (campaign, self.max_attempts)).fetchone()[0]
+        return campaign if left else None
+
+    def resume(self):
+        # Entries of the most recent campaign that are still to do, with whatever was interrupted put back
+        # to pending. Returns (entry ids, experiments) in queue order.
+        campaign = self.unfinished()
+        if campaign is None:
+            return [], []
+        with self.lock, self.db:
+            self.db.execute(f"UPDATE entries SET state = 'pending', updated = ? WHERE campaign = ? AND {LEFT}",
+                            (time.time(), campaign, self.max_attempts))
+            rows = self.db.execute(f"SELECT id, experiment FROM entries WHERE campaign = ? AND {LEFT} "
+                                   "ORDER BY position", (campaign, self.max_attempts)).fetchall()
+        return [row[0] for row in rows], [Experiment.from_dict(json.loads(row[1])) for row in rows]
+
+    def mark(self, entry, state, output=None, error=None):
+        # A failed entry stays failed for the rest of the run, only resume() puts it back to pending. Its
+        # chip load may still finish after its robot move failed.
+        if state not in STATES:
+            raise ValueError(f"Unknown queue state {state}")
+        with self.lock, self.db:
+            self.db.execute("UPDATE entries SET state = ?, output = COALESCE(?, output), error = ?, updated = ? "
+                            "WHERE id = ? AND (state != 'failed' OR ? = 'failed')",
+                            (state, output, error, time.time(), entry, state))
+
+    def staging(self, entry):
+        # Whichever stage of an entry starts first counts the attempt, so failed moves and chip loads are
+        # capped by max_attempts like failed measurements
+        with self.lock, self.db:
+            self.db.execute("UPDATE entries SET state = 'staging', attempts = attempts + (state = 'pending'), "
+                            "updated = ? WHERE id = ? AND state IN ('pending', 'staging')", (time.time(), entry))
+
+    def running(self, entry):
+        # Marks the entry running and returns a fresh output path for this attempt, without the extension
+        with self.lock, self.db:
+            campaign, position, attempts, state, data = self.db.execute(
+                "SELECT campaign, position, attempts, state, experiment FROM entries WHERE id = ?",
+                (entry,)).fetchone()
+            if state == "pending":  # No move or chip load before it to count the attempt
+                attempts += 1
+            technique = json.loads(data)["technique"].lower()
+            output = os.path.join(self.directory, f"{technique}_{campaign:04d}_{position:03d}_{attempts}")
+            self.db.execute("UPDATE entries SET state = 'running', attempts = ?, output = ?, error = NULL, "
+                            "updated = ? WHERE id = ?", (attempts, output + ".csv", time.time(), entry))
+        return output
+
+    def entries(self, campaign):
+        return self.db.execute("SELECT position, state, attempts, output, error FROM entries WHERE campaign = ? "
+                               "ORDER BY position", (campaign,)).fetchall()
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,141 @@
+######################################################################################
+# Reorders a pending experiment queue to cut robot travel, chip reprogramming and technique reloads
+######################################################################################
+
+import os
+from dataclasses import astuple
+
+import numpy as np
+
+import gcodeplan
+from definitions import CONFIG
+
+CELL_SECONDS = 60e-6  # Write, read back and two settle waits per changed cell, see Adlink.set_chip_map
+LOCAL_SEARCH_LIMIT = 300  # Above this many free experiments only the greedy pass runs
+
+
+class QueueCost:
+    def __init__(self, gcode_dir, limits=None):
+        self.gcode_dir = gcode_dir
+        self.limits = limits or gcodeplan.MachineLimits.from_config()
+        self.reload_seconds = CONFIG.getfloat('Queue', 'technique_reload', fallback=1.0)
+        self.home = gcodeplan.Well("home", 0.0, 0.0, self.limits.home_z)
+        self._wells = {}
+        self._maps = {}
+
+    def well(self, exp):
+        if exp.gcode.file not in self._wells:
+            position = gcodeplan.final_position(os.path.join(self.gcode_dir, exp.gcode.file))
+            self._wells[exp.gcode.file] = gcodeplan.Well(exp.gcode.name, *position)
+        return self._wells[exp.gcode.file]
+
+    def chipmap(self, exp):
+        key = (exp.block.name, exp.block.start_row, exp.block.start_col)
+        if key not in self._maps:
+            self._maps[key] = np.array(exp.block.chipmap())
+        return self._maps[key]
+
+    def robot(self, a, b):
+        return gcodeplan.travel_time(self.home if a is None else self.well(a), self.well(b), self.limits)
+
+    def chip(self, a, b):
+        if a is None:
+            return self.chipmap(b).size * CELL_SECONDS  # First load writes every cell
+        return np.count_nonzero(self.chipmap(a) != self.chipmap(b)) * CELL_SECONDS
+
+    def technique(self, a, b):
+        if a is not None and a.technique == b.technique and astuple(a.vcfg) == astuple(b.vcfg):
+            return 0.0
+        return self.reload_seconds
+
+    def step(self, a, b):
+        # The robot and chip stages overlap in the scheduler, so only the slower of the two counts
+        return max(self.robot(a, b), self.chip(a, b)) + self.technique(a, b)
+
+    def key(self, exp):
+        # Experiments with the same key cost the same to reach and to leave
+        return (exp.gcode.file, exp.block.name, exp.block.start_row, exp.block.start_col, exp.technique,
+                astuple(exp.vcfg))
+
+    def matrix(self, experiments):
+        # Step costs between the distinct keys of experiments, worked out once per pair of wells, pair of
+        # chip maps and pair of techniques. Returns (key index of every experiment, cost from the start
+        # position to every key, key x key step costs).
+        keys, first = {}, []
+        indices = np.array([keys.setdefault(self.key(exp), len(keys)) for exp in experiments], dtype=np.intp)
+        for exp, index in zip(experiments, indices):
+            if index == len(first):
+                first.append(exp)
+
+        wells = {exp.gcode.file: self.well(exp) for exp in first}
+        well_index = {file: i for i, file in enumerate(wells)}
+        travel = np.array([[gcodeplan.travel_time(a, b, self.limits) for b in wells.values()]
+                           for a in [self.home, *wells.values()]])
+        robot = travel[np.ix_([0] + [1 + well_index[exp.gcode.file] for exp in first],
+                              [well_index[exp.gcode.file] for exp in first])]
+
+        maps = {}
+        map_index = [maps.setdefault((exp.block.name, exp.block.start_row, exp.block.start_col), len(maps))
+                     for exp in first]
+        flat = np.array([self.chipmap(exp).ravel() for exp in first])[np.unique(map_index, return_index=True)[1]]
+        changed = np.array([np.count_nonzero(flat != row, axis=1) for row in flat])
+        chip = np.vstack((np.full(len(maps), flat.shape[1]), changed))[np.ix_([0] + [1 + i for i in map_index],
+                                                                              map_index)] * CELL_SECONDS
+
+        techniques = [(exp.technique, astuple(exp.vcfg)) for exp in first]
+        technique = np.array([[0.0 if a == b else self.reload_seconds for b in techniques] for a in techniques])
+        technique = np.vstack((np.full(len(first), self.reload_seconds), technique))
+
+        steps = np.maximum(robot, chip) + technique
+        return indices, steps[0], steps[1:]
+
+    def total(self, experiments):
+        if not experiments:
+            return 0.0
+        indices, start, steps = self.matrix(experiments)
+        return float(start[indices[0]] + steps[indices[:-1], indices[1:]].sum())
+
+
+def optimise(experiments, cost, pinned=()):
+    # Experiments at pinned indices keep their place, the rest are shuffled among the remaining slots.
+    # Everything runs on the key indices of cost.matrix, no step is worked out twice.
+    pinned = set(pinned)
+    slots = [i for i in range(len(experiments)) if i not in pinned]
+    if not slots:
+        return list(experiments)
+    indices, start, steps = cost.matrix(experiments)
+    free = np.array(slots)  # Experiments not placed yet, by their original index
+    order = list(range(len(experiments)))
+
+    # Greedy: fill each free slot with the cheapest experiment to reach from whatever precedes it
+    for i in slots:
+        reach = start[indices[free]] if i == 0 else steps[indices[order[i - 1]], indices[free]]
+        best = int(np.argmin(reach))
+        order[i] = int(free[best])
+        free = np.delete(free, best)
+
+    if len(slots) <= LOCAL_SEARCH_LIMIT:
+        # Then swap pairs of free experiments while that lowers the total. Plain lists index faster than numpy
+        # one element at a time.
+        key, first, table = indices.tolist(), start.tolist(), steps.tolist()
+
+        def step(a, b):  # a and b are original indices, a None for the start position
+            return first[key[b]] if a is None else table[key[a]][key[b]]
+
+        def around(i):
+            return (step(order[i - 1] if i > 0 else None, order[i])
+                    + (step(order[i], order[i + 1]) if i + 1 < len(order) else 0))
+
+        improved = True
+        while improved:
+            improved = False
+            for a in range(len(slots)):
+                for b in range(a + 1, len(slots)):
+                    i, j = slots[a], slots[b]
+                    before = around(i) + around(j)
+                    order[i], order[j] = order[j], order[i]
+                    if around(i) + around(j) < before - 1e-9:
+                        improved = True
+                    else:
+                        order[i], order[j] = order[j], order[i]
+    return [experiments[i] for i in order]
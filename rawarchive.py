@@ -0,0 +1,182 @@
+######################################################################################
+# Raw GetData archive: the words exactly as the instrument sent them, decoded on read
+######################################################################################
+
+# File layout, all little endian:
+#   16 byte file header: MAGIC (8 bytes), board type (uint32), block header size (uint32)
+#   then one block per GetData poll: a BLOCK_DTYPE record (CurrentValues, DataInfo, host time, word count)
+#   followed by the poll's raw uint32 words.
+# A <file>.idx next to it holds the byte offset and word count of every block. If it is missing or short
+# (the run died before it was flushed) the blocks are found again by walking the headers.
+
+import os
+from array import array
+
+import numpy as np
+
+import kbio.kbio_types as KBIO
+from kbio.tech_types import TECH_ID
+
+MAGIC = b"KBRAW\x00\x01\x00"
+FILE_HEADER = np.dtype([("magic", "S8"), ("board_type", "<u4"), ("block_size", "<u4")])
+INDEX_DTYPE = np.dtype([("offset", "<i8"), ("nwords", "<i8")])
+
+# Essential (VMP3) and Premium (SP-300) boards send IEEE floats, so their words can simply be viewed as
+# float32. Anything else goes through ConvertChannelNumericIntoSingle one word at a time.
+IEEE_BOARDS = (KBIO.BOARD_TYPE.ESSENTIAL.value, KBIO.BOARD_TYPE.PREMIUM.value)
+
+_CTYPES = {"c_int": "<i4", "c_long": "<i4", "c_float": "<f4", "c_double": "<f8"}
+
+
+def _fields(prefix, struct):
+    return [(prefix + name, _CTYPES[ctype.__name__]) for name, ctype in struct._fields_]
+
+
+BLOCK_DTYPE = np.dtype(_fields("cv_", KBIO.CurrentValues) + _fields("di_", KBIO.DataInfo)
+                       + [("host_time", "<f8"), ("nwords", "<u4")])
+
+
+def to_float(words, board_type, api=None):
+    if board_type in IEEE_BOARDS:
+        return np.ascontiguousarray(words, dtype="<u4").view("<f4")
+    if api is None:
+        raise ValueError(f"Board type {board_type} needs the instrument API to convert its values")
+    return np.array([api.ConvertChannelNumericIntoSingle(int(word), board_type) for word in words], dtype="<f4")
+
+
+def decode_cv(words, ncols, time_base, board_type, api=None):
+    # CV records are t_high, t_low, [Ec,] I, Ewe, cycle. time_base is a scalar or one value per row.
+    rows = np.asarray(words, dtype="<u4").reshape(-1, ncols)
+    if ncols not in (5, 6):
+        raise ValueError(f"CV : unexpected record length ({ncols - 2})")
+    t_rel = (rows[:, 0].astype(np.uint64) << np.uint64(32)) | rows[:, 1]
+    columns = {"t": t_rel * np.asarray(time_base, dtype=np.float64)}
+    names = ("Ec", "I", "Ewe") if ncols == 6 else ("I", "Ewe")
+    for i, name in enumerate(names):
+        columns[name] = to_float(rows[:, 2 + i], board_type, api)
+    columns["cycle"] = rows[:, -1].astype(np.int32)
+    return columns
+
+
+# Impedance techniques send two kinds of record: process 0 is the time trace (t_high, t_low, Ewe, I) and
+# process 1 one row per frequency, laid out as below in the BioLogic development package documentation
+EIS_TECHNIQUES = (TECH_ID.PEIS, TECH_ID.GEIS, TECH_ID.SPEIS, TECH_ID.SGEIS)
+EIS_COLUMNS = ("freq", "abs_Ewe", "abs_I", "phase_Zwe", "Ewe", "I", None, "abs_Ece", "abs_Ice", "phase_Zce",
+               "Ece", None, None, "t", "Irange")
+
+
+def decode_eis(words, ncols, board_type, api=None):
+    # Frequency records of an impedance technique, with |Z| and the complex impedance worked out
+    rows = np.asarray(words, dtype="<u4").reshape(-1, ncols)
+    if ncols < 4:
+        raise ValueError(f"EIS : unexpected record length ({ncols})")
+    columns = {}
+    for i, name in enumerate(EIS_COLUMNS[:ncols]):
+        if name == "Irange":
+            columns[name] = rows[:, i].astype(np.int32)
+        elif name is not None:
+            columns[name] = to_float(rows[:, i], board_type, api)
+    columns["abs_Z"] = columns["abs_Ewe"] / columns["abs_I"]
+    columns["Z"] = columns["abs_Z"] * np.exp(1j * np.deg2rad(columns["phase_Zwe"].astype(np.float64)))
+    return columns
+
+
+class RawArchiveWriter:
+    # Appending a poll is two writes of bytes that already exist, cheap enough for the acquisition loop
+    def __init__(self, path, board_type):
+        self.path = path
+        self.file = open(path, "wb")
+        self.index = open(path + ".idx", "wb")
+        self.file.write(np.array((MAGIC, board_type, BLOCK_DTYPE.itemsize), FILE_HEADER).tobytes())
+        self.offset = FILE_HEADER.itemsize
+        self.header = np.zeros((), BLOCK_DTYPE)
+
+    def append(self, data, host_time=0.0):
+        current_values, data_info, words = data
+        for name, _ in KBIO.CurrentValues._fields_:
+            self.header["cv_" + name] = getattr(current_values, name)
+        for name, _ in KBIO.DataInfo._fields_:
+            self.header["di_" + name] = getattr(data_info, name)
+        self.header["host_time"] = host_time
+        self.header["nwords"] = len(words)
+        self.file.write(self.header.tobytes())
+        # array('L') is 4 bytes on Windows but 8 on 64 bit Linux
+        self.file.write(words.tobytes() if words.itemsize == 4 else np.asarray(words, dtype="<u4").tobytes())
+        self.file.flush()
+        self.index.write(np.array((self.offset, len(words)), INDEX_DTYPE).tobytes())
+        self.index.flush()
+        self.offset += BLOCK_DTYPE.itemsize + 4 * len(words)
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RawArchive:
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        file_header = self.data[:FILE_HEADER.itemsize].view(FILE_HEADER)[0]
+        if file_header["magic"] != MAGIC.rstrip(b"\x00") or file_header["block_size"] != BLOCK_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a raw archive this version can read")
+        self.board_type = int(file_header["board_type"])
+        self.index = self._load_index()
+        self.headers = np.array([self.data[offset:offset + BLOCK_DTYPE.itemsize].view(BLOCK_DTYPE)[0]
+                                 for offset in self.index["offset"]], dtype=BLOCK_DTYPE)
+
+    def _load_index(self):
+        index = np.zeros(0, INDEX_DTYPE)
+        if os.path.exists(self.path + ".idx"):
+            index = np.fromfile(self.path + ".idx", dtype=INDEX_DTYPE)
+        offset = FILE_HEADER.itemsize if len(index) == 0 else \
+            int(index["offset"][-1]) + BLOCK_DTYPE.itemsize + 4 * int(index["nwords"][-1])
+        extra = []
+        while offset + BLOCK_DTYPE.itemsize <= len(self.data):  # Blocks written after the index was last flushed
+            nwords = int(self.data[offset:offset + BLOCK_DTYPE.itemsize].view(BLOCK_DTYPE)[0]["nwords"])
+            if offset + BLOCK_DTYPE.itemsize + 4 * nwords > len(self.data):
+                break  # Torn last block
+            extra.append((offset, nwords))
+            offset += BLOCK_DTYPE.itemsize + 4 * nwords
+        return np.concatenate([index, np.array(extra, INDEX_DTYPE)])
+
+    def __len__(self):
+        return len(self.index)
+
+    def words(self, block):
+        start = int(self.index["offset"][block]) + BLOCK_DTYPE.itemsize
+        return self.data[start:start + 4 * int(self.index["nwords"][block])].view("<u4")
+
+    def get_data(self, block):
+        # The block as GetData returned it: (CurrentValues, DataInfo, array('L'))
+        header = self.headers[block]
+        current_values = KBIO.CurrentValues(*(header["cv_" + name].item()
+                                              for name, _ in KBIO.CurrentValues._fields_))
+        data_info = KBIO.DataInfo(*(header["di_" + name].item() for name, _ in KBIO.DataInfo._fields_))
+        return current_values, data_info, array("L", self.words(block).tolist())
+
+    def decode(self, technique=TECH_ID.CV, api=None):
+        # All blocks of one technique decoded in one go, as numpy columns. For impedance techniques only the
+        # frequency records are decoded.
+        selected = (self.headers["di_TechniqueID"] == technique.value) & (self.headers["nwords"] > 0)
+        if technique in EIS_TECHNIQUES:
+            selected &= self.headers["di_ProcessIndex"] == 1
+        blocks = np.flatnonzero(selected)
+        if len(blocks) == 0:
+            return {}
+        ncols = np.unique(self.headers["di_NbCols"][blocks])
+        if len(ncols) != 1:
+            raise ValueError(f"{technique.name} blocks have different record lengths {ncols.tolist()}")
+        words = np.concatenate([self.words(block) for block in blocks])
+        rows = self.headers["di_NbRows"][blocks]
+        time_base = np.repeat(self.headers["cv_TimeBase"][blocks].astype(np.float64), rows)
+        if technique == TECH_ID.CV:
+            return decode_cv(words, int(ncols[0]), time_base, self.board_type, api)
+        if technique in EIS_TECHNIQUES:
+            return decode_eis(words, int(ncols[0]), self.board_type, api)
+        raise ValueError(f"No decoder for {technique.name} yet")
@@ -0,0 +1,97 @@
+######################################################################################
+# Replays archived GetData blocks through the acquisition loop, no instrument needed
+######################################################################################
+
+import argparse
+import filecmp
+import os
+import tempfile
+import time
+from array import array
+
+import kbio.kbio_types as KBIO
+from acquisition import acquire
+from rawarchive import RawArchive
+from timeline import Timeline
+
+
+class ReplaySource:
+    # Stands in for KBIO_api in acquire(). GetData hands out the archived blocks in order, straight away or,
+    # with realtime, spaced out like they were recorded (speed > 1 replays faster than real time).
+    def __init__(self, path, realtime=False, speed=1.0):
+        self.archive = RawArchive(path)
+        self.board_type = self.archive.board_type
+        self.realtime = realtime
+        self.speed = speed
+        self.block = 0
+        self.started = None
+
+    def GetData(self, id_, ch):
+        if self.block >= len(self.archive):
+            # The recording ended without the channel stopping (the run crashed), stop it here
+            current_values = KBIO.CurrentValues()
+            current_values.State = KBIO.PROG_STATE.STOP.value
+            return current_values, KBIO.DataInfo(), array("L")
+        if self.realtime:
+            host_time = self.archive.headers["host_time"]
+            if self.started is None:
+                self.started = time.perf_counter()
+            delay = self.started + (host_time[self.block] - host_time[0]) / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        data = self.archive.get_data(self.block)
+        self.block += 1
+        return data
+
+    def ConvertChannelNumericIntoSingle(self, vi, board_type):
+        raise RuntimeError(f"Board type {board_type} values can only be converted with the instrument library")
+
+    def StopChannel(self, id_, ch):
+        pass
+
+
+def replay(path, filename, realtime=False, speed=1.0):
+    # Runs the archive at path through acquire(), writing <filename>.csv/.kbraw. Returns throughput figures.
+    source = ReplaySource(path, realtime, speed)
+    start = time.perf_counter()
+    rows = acquire(source, 0, 1, source.board_type, filename, interval=0, timeline=Timeline(), verbose=False)
+    elapsed = time.perf_counter() - start
+    return {"blocks": source.block, "rows": rows, "seconds": elapsed,
+            "rows_per_second": rows / elapsed if elapsed > 0 else float("inf"),
+            "bytes": os.path.getsize(path)}
+
+
+def verify(path, reference_csv):
+    # Replays the archive and compares the CSV it produces with an earlier run's, byte for byte.
+    # Returns None when they match, or the first line number (from 1) where they differ.
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "replay")
+        replay(path, filename)
+        if filecmp.cmp(f"{filename}.csv", reference_csv, shallow=False):
+            return None
+        with open(f"{filename}.csv") as new, open(reference_csv) as old:
+            line = 0
+            for line, (a, b) in enumerate(zip(new, old), 1):
+                if a != b:
+                    return line
+            return line + 1  # One file is a prefix of the other
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a raw PAR archive through the acquisition pipeline")
+    parser.add_argument("archive", help=".kbraw file written during a run")
+    parser.add_argument("--output", help="Write the replayed data here (no extension) instead of a temp file")
+    parser.add_argument("--realtime", action="store_true", help="Keep the recorded spacing between polls")
+    parser.add_argument("--speed", type=float, default=1.0, help="Speed up factor for --realtime")
+    parser.add_argument("--verify", help="CSV from the original run to compare the replayed output with")
+    args = parser.parse_args()
+
+    if args.verify:
+        line = verify(args.archive, args.verify)
+        print("Replay matches" if line is None else f"Replay differs from {args.verify} at line {line}")
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            stats = replay(args.archive, args.output or os.path.join(directory, "replay"), args.realtime,
+                           args.speed)
+        print(f"{stats['blocks']} blocks, {stats['rows']} rows in {stats['seconds']:.3f} s "
+              f"({stats['rows_per_second']:.0f} rows/s, {stats['bytes'] / stats['seconds'] / 1e6:.1f} MB/s)")
@@ -0,0 +1,95 @@
+######################################################################################
+# Content addressed cache of finished experiments, so reruns only do what is missing
+######################################################################################
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import astuple
+
+from definitions import ROOT_DIR, CONFIG, GET_CHIP
+
+
+def results_dir():
+    # Read when it is needed, so a config file loaded after import (cli.py --config) is honoured
+    return CONFIG.get('Results', 'directory', fallback=os.path.join(ROOT_DIR, 'results'))
+
+
+_gcode_hashes = {}
+
+
+def gcode_hash(gcode):
+    # Hash the file contents so editing a G-code file invalidates results that used it
+    path = os.path.join(ROOT_DIR, 'gcode', gcode.file)
+    stamp = os.path.getmtime(path) if os.path.exists(path) else None
+    if path not in _gcode_hashes or _gcode_hashes[path][0] != stamp:
+        digest = None
+        if stamp is not None:
+            with open(path, 'rb') as file:
+                digest = hashlib.sha256(file.read()).hexdigest()
+        _gcode_hashes[path] = (stamp, digest)
+    return _gcode_hashes[path][1]
+
+
+def experiment_key(exp, chip=None):
+    # Names are left out on purpose, a renamed vcfg or block with the same contents is the same experiment.
+    # Each run of a repeated experiment is its own result.
+    block = exp.block
+    content = {
+        "solution": exp.solution,
+        "block": [block.num_rows, block.num_cols, block.start_row, block.start_col, block.definition],
+        "technique": exp.technique,
+        "vcfg": list(astuple(exp.vcfg)[1:]),
+        "gcode": [exp.gcode.file, gcode_hash(exp.gcode)],
+        "chip": GET_CHIP() if chip is None else chip,
+    }
+    if exp.repeat:  # Keys of experiments that are not repeats stay as they were
+        content["repeat"] = exp.repeat
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory=None):
+        self.directory = directory or results_dir()
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as file:
+                self.entries = json.load(file)
+
+    def output_path(self, exp):
+        # Where a run of this experiment writes its data, without the .csv extension
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{exp.technique.lower()}_{experiment_key(exp)[:16]}")
+
+    def lookup(self, exp, revalidate=False):
+        entry = self.entries.get(experiment_key(exp))
+        if entry is None:
+            return None
+        if revalidate and not self.valid(entry["output"]):
+            return None
+        return entry
+
+    @staticmethod
+    def valid(output):
+        # The file is there and holds more than its header line
+        if not os.path.exists(output):
+            return False
+        with open(output, 'r') as file:
+            return file.readline() != "" and file.readline() != ""
+
+    def store(self, exp, output):
+        with self.lock:
+            self.entries[experiment_key(exp)] = {"output": output, "finished": time.time(),
+                                                 "experiment": str(exp).strip()}
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, 'w') as file:
+                json.dump(self.entries, file, indent=1)
+            os.replace(temp_path, self.index_path)  # Never leave a half written index behind
+
+    def pending(self, experiments, revalidate=False):
+        return [exp for exp in experiments if self.lookup(exp, revalidate) is None]
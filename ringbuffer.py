@@ -0,0 +1,57 @@
+######################################################################################
+# Fixed size NumPy ring buffer shared between an acquisition thread and its readers
+######################################################################################
+
+import threading
+
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity, channels=1, dtype=np.float64):
+        self.capacity = capacity
+        self.channels = channels
+        self.data = np.zeros((capacity, channels), dtype=dtype)
+        self.total = 0  # Samples ever written, the oldest sample held is max(0, total - capacity)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype).reshape(-1, self.channels)
+        count = len(values)
+        if count == 0:
+            return
+        with self.lock:
+            if count >= self.capacity:  # Only the tail survives anyway
+                self.total += count
+                self.data[np.arange(self.total - self.capacity, self.total) % self.capacity] = values[-self.capacity:]
+                return
+            start = self.total % self.capacity
+            first = min(count, self.capacity - start)
+            self.data[start:start + first] = values[:first]
+            self.data[:count - first] = values[first:]
+            self.total += count
+
+    def latest(self, count=None):
+        # Copy of the newest samples in chronological order, plus the index of the first one returned
+        with self.lock:
+            return self._latest(count)
+
+    def since(self, index):
+        # Everything written after sample number index that is still held, for incremental readers. Counted
+        # and copied under one lock, so an extend in between cannot hand back samples the reader already had.
+        with self.lock:
+            return self._latest(max(0, self.total - max(index, self.total - self.capacity)))
+
+    def _latest(self, count):
+        held = min(self.total, self.capacity)
+        count = held if count is None else min(count, held)
+        end = self.total % self.capacity
+        index = np.arange(end - count, end) % self.capacity
+        return self.data[index], self.total - count
+
+    def clear(self):
+        with self.lock:
+            self.total = 0
@@ -0,0 +1,181 @@
+######################################################################################
+# Runs experiment stages on their own devices in parallel, respecting the order physics needs
+######################################################################################
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass(eq=False)
+class Stage:
+    name: str
+    resource: str
+    action: callable
+    after: list = field(default_factory=list)  # Stages whose results this one needs, skipped if they fail
+    barriers: list = field(default_factory=list)  # Stages that only have to be over first, whatever happened
+    done: threading.Event = field(default_factory=threading.Event)
+    error: Exception = None
+    skipped: bool = False
+    started: float = None
+    finished: float = None
+
+    @property
+    def duration(self):
+        return 0.0 if self.started is None else self.finished - self.started
+
+
+class Scheduler:
+    # One worker thread per resource runs that resource's stages in the order they were added. A stage
+    # waits for everything in its after and barriers lists, so the only parallelism is between different
+    # resources. Only a failed or skipped after stage makes it skip; barriers just keep the order.
+    def __init__(self):
+        self.stages = []
+        self.queues = {}
+
+    def add(self, name, resource, action, after=(), barriers=()):
+        stage = Stage(name, resource, action, [dep for dep in after if dep is not None],
+                      [dep for dep in barriers if dep is not None])
+        self.stages.append(stage)
+        self.queues.setdefault(resource, []).append(stage)
+        return stage
+
+    def _worker(self, stages):
+        for stage in stages:
+            for dep in stage.after + stage.barriers:
+                dep.done.wait()
+            if any(dep.error is not None or dep.skipped for dep in stage.after):
+                stage.skipped = True  # Something this stage relies on did not happen
+            else:
+                stage.started = time.perf_counter()
+                try:
+                    stage.action()
+                except Exception as e:
+                    stage.error = e
+                    print(f"{stage.name} failed: {e}")
+                stage.finished = time.perf_counter()
+            stage.done.set()
+
+    def run(self):
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._worker, args=(stages,), name=f"stage-{resource}", daemon=True)
+                   for resource, stages in self.queues.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+
+class ExperimentScheduler:
+    # Each experiment is a robot move, a chip load and a measurement. The measurement needs both of the
+    # others finished. The next experiment's chip load waits for this measurement if it uses the same chip
+    # socket, and its robot move waits for it too unless robot_barrier is off (robot not holding the cell).
+    # With a ResultCache, experiments that already have results are left out of the queue and finished
+    # measurements are recorded in it. revalidate also reruns entries whose data file is missing or empty.
+    # With a QueueJournal every experiment's progress is written down as it happens and resume() carries
+    # on with whatever the last campaign did not finish. Finished measurements are handed to the
+    # PostProcessor if given, which converts, analyses and catalogues them in worker processes.
+    def __init__(self, move=None, program=None, measure=None, sockets=None, robot_barrier=True, cache=None,
+                 revalidate=False, journal=None, postprocess=None):
+        self.move = move  # move(experiment), blocks until the robot is in place
+        self.program = program  # program(experiment, card_num, channel)
+        self.measure = measure  # measure(experiment, index, output), returns the data file written or None
+        self.sockets = sockets or [(0, 1)]
+        self.robot_barrier = robot_barrier
+        self.cache = cache
+        self.revalidate = revalidate
+        self.journal = journal
+        self.postprocess = postprocess
+        self.queued = 0  # Experiments the last run() actually queued, after the cache left some out
+
+    def journaled(self, entry, action, last):
+        # Runs a move or chip load, recording its state before and after in the journal
+        if self.journal is None:
+            return action()
+        self.journal.staging(entry)
+        try:
+            action()
+        except Exception as e:
+            self.journal.mark(entry, "failed", error=str(e))
+            raise
+        if last:
+            self.journal.mark(entry, "done")
+
+    def measure_stage(self, exp, index, entry):
+        if self.journal is not None:
+            output = self.journal.running(entry)
+        elif self.cache is not None:
+            output = self.cache.output_path(exp)
+        else:
+            output = f"cv{index}"
+        try:
+            written = self.measure(exp, index, output)
+        except Exception as e:
+            if self.journal is not None:
+                self.journal.mark(entry, "failed", error=str(e))
+            raise
+        if self.journal is not None:
+            self.journal.mark(entry, "done", output=written)
+        if written is not None and self.cache is not None:
+            self.cache.store(exp, written)
+        if written is not None and self.postprocess is not None:
+            self.postprocess.submit(exp, written)
+
+    def build(self, experiments, entries=None):
+        entries = entries or [None] * len(experiments)
+        scheduler = Scheduler()
+        last_measure = None
+        socket_measure = {}  # Last measurement that used each socket
+        for index, (exp, entry) in enumerate(zip(experiments, entries)):
+            card_num, channel = self.sockets[index % len(self.sockets)]
+            move = program = None
+            if self.move is not None:
+                move = scheduler.add(f"Move {index} ({exp.gcode.name})", "robot",
+                                     lambda exp=exp, e=entry: self.journaled(
+                                         e, lambda: self.move(exp), self.program is None and self.measure is None),
+                                     barriers=[last_measure] if self.robot_barrier else [])
+            if self.program is not None:
+                program = scheduler.add(f"Load {index} ({exp.block.name})", f"chip {card_num}-{channel}",
+                                        lambda exp=exp, e=entry, c=card_num, ch=channel: self.journaled(
+                                            e, lambda: self.program(exp, c, ch), self.measure is None),
+                                        barriers=[socket_measure.get((card_num, channel))])
+            if self.measure is not None:
+                last_measure = scheduler.add(f"Measure {index} ({exp.vcfg.name})", "par",
+                                             lambda exp=exp, i=index, e=entry: self.measure_stage(exp, i, e),
+                                             [move, program])
+                socket_measure[(card_num, channel)] = last_measure
+        return scheduler
+
+    def run(self, experiments, entries=None):
+        if self.journal is not None and entries is None:
+            entries = self.journal.start(experiments)
+        if self.cache is not None:
+            entries = entries or [None] * len(experiments)
+            pending = []
+            for exp, entry in zip(experiments, entries):
+                cached = self.cache.lookup(exp, self.revalidate)
+                if cached is None:
+                    pending.append((exp, entry))
+                elif self.journal is not None:
+                    self.journal.mark(entry, "done", output=cached["output"])
+            if len(pending) < len(experiments):
+                print(f"Skipping {len(experiments) - len(pending)} experiments that already have results")
+            experiments, entries = [exp for exp, _ in pending], [entry for _, entry in pending]
+        self.queued = len(experiments)
+        scheduler = self.build(experiments, entries)
+        elapsed = scheduler.run()
+        serial = sum(stage.duration for stage in scheduler.stages)
+        failed = [stage for stage in scheduler.stages if stage.error is not None or stage.skipped]
+        print(f"Queue finished in {elapsed:.1f} s, stages took {serial:.1f} s back to back")
+        for stage in failed:
+            print(f"{stage.name}: {'skipped' if stage.skipped else stage.error}")
+        return scheduler.stages
+
+    def resume(self):
+        entries, experiments = self.journal.resume()
+        if not experiments:
+            print("Nothing to resume, the last campaign finished")
+            return []
+        print(f"Resuming {len(experiments)} unfinished experiments")
+        return self.run(experiments, entries)
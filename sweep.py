@@ -0,0 +1,107 @@
+######################################################################################
+# Design of experiments sweeps over CV parameters and block placements, built in memory
+######################################################################################
+
+import dataclasses
+import itertools
+
+import numpy as np
+
+import experiment
+
+CV_AXES = {f.name: f.type for f in dataclasses.fields(experiment.CV) if f.name != "name"}
+BLOCK_AXES = {"start_row": int, "start_col": int}
+METHODS = ["grid", "lhs", "random"]
+
+
+class CVVariants:
+    # Makes CV copies with some values overridden, identical overrides share one object
+    def __init__(self):
+        self.variants = {}
+
+    def get(self, cv, overrides):
+        if not overrides:
+            return cv
+        key = (cv.name, tuple(sorted(overrides.items())))
+        if key not in self.variants:
+            label = ",".join(f"{name}={value:g}" if isinstance(value, float) else f"{name}={value}"
+                             for name, value in sorted(overrides.items()))
+            self.variants[key] = dataclasses.replace(cv, name=f"{cv.name}[{label}]", **overrides)
+        return self.variants[key]
+
+
+def axis_type(name):
+    if name in CV_AXES:
+        return CV_AXES[name]
+    if name in BLOCK_AXES:
+        return BLOCK_AXES[name]
+    raise ValueError(f"Unknown sweep axis: {name}")
+
+
+def grid_points(axes):
+    # axes maps each name to a list of values
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def lhs_points(axes, points, rng):
+    # axes maps each name to (low, high), every axis is cut into points strata and each stratum used once
+    samples = {}
+    for name, (low, high) in axes.items():
+        u = (rng.permutation(points) + rng.random(points)) / points
+        samples[name] = low + u * (high - low)
+    return [{name: samples[name][i] for name in axes} for i in range(points)]
+
+
+def random_points(axes, points, rng):
+    samples = {name: rng.uniform(low, high, points) for name, (low, high) in axes.items()}
+    return [{name: samples[name][i] for name in axes} for i in range(points)]
+
+
+def config_key(exp):
+    # Two experiments with the same key would run exactly the same thing
+    block = exp.block
+    return (exp.solution, block.name, block.start_row, block.start_col, exp.technique,
+            dataclasses.astuple(exp.vcfg)[1:], exp.gcode.name)
+
+
+def dedupe(experiments):
+    seen = set()
+    unique = []
+    for exp in experiments:
+        key = config_key(exp)
+        if key not in seen:
+            seen.add(key)
+            unique.append(exp)
+    return unique
+
+
+def sweep(base, axes, method="grid", points=None, seed=None, variants=None):
+    # base is the Experiment every point starts from. For grid, axes hold lists of values; for lhs and
+    # random they hold (low, high) bounds and points says how many to draw.
+    if method not in METHODS:
+        raise ValueError(f"Unknown sweep method: {method}")
+    types = {name: axis_type(name) for name in axes}
+    if method == "grid":
+        design = grid_points(axes)
+    else:
+        if not points:
+            raise ValueError(f"{method} sweep needs a number of points")
+        rng = np.random.default_rng(seed)
+        design = (lhs_points if method == "lhs" else random_points)(axes, points, rng)
+
+    variants = variants or CVVariants()
+    experiments = []
+    for point in design:
+        point = {name: types[name](round(value) if types[name] is int else float(value))
+                 for name, value in point.items()}
+        cv = variants.get(base.vcfg, {name: value for name, value in point.items() if name in CV_AXES})
+        block = base.block
+        placement = {name: value for name, value in point.items() if name in BLOCK_AXES}
+        if placement:
+            block = dataclasses.replace(block, **placement)
+            if not (0 <= block.start_row <= 64 - block.num_rows and 0 <= block.start_col <= 16 - block.num_cols):
+                raise ValueError(f"Block {block.name} does not fit at row {block.start_row}, "
+                                 f"column {block.start_col}")
+        experiments.append(experiment.Experiment(base.solution, block, base.technique, cv, base.gcode))
+    return dedupe(experiments)
@@ -0,0 +1,91 @@
+######################################################################################
+# Host side timeline of chip, robot and instrument events on one monotonic clock
+######################################################################################
+
+import bisect
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+def now():
+    return time.perf_counter()  # Same clock as adlink.AIStream sample times
+
+
+@dataclass
+class Event:
+    t: float
+    kind: str
+    data: dict = field(default_factory=dict)
+
+
+@dataclass
+class ClockOffset:
+    offset: float  # host time = instrument time + offset
+    error: float  # Half width of the host window the estimate was taken in
+
+
+class Timeline:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []  # Kept sorted by time, appends are nearly always at the end
+        self.times = []  # Event times alongside self.events, for bisecting
+        self.offsets = {}  # Instrument name -> ClockOffset
+
+    def record(self, kind, t=None, **data):
+        event = Event(now() if t is None else t, kind, data)
+        with self.lock:
+            i = bisect.bisect_right(self.times, event.t)
+            self.times.insert(i, event.t)
+            self.events.insert(i, event)
+        return event
+
+    def observe_clock(self, instrument, instrument_time, host_before, host_after):
+        # The instrument reading was taken somewhere between host_before and host_after. Keep the estimate
+        # from the narrowest window seen so far, it bounds the offset the tightest.
+        error = (host_after - host_before) / 2
+        best = self.offsets.get(instrument)
+        if best is None or error < best.error:
+            self.offsets[instrument] = ClockOffset(host_before + error - instrument_time, error)
+
+    def to_host(self, instrument, instrument_time):
+        return np.asarray(instrument_time) + self.offsets[instrument].offset
+
+    def query(self, kind=None, t_start=None, t_end=None):
+        with self.lock:
+            lo = 0 if t_start is None else bisect.bisect_left(self.times, t_start)
+            hi = len(self.times) if t_end is None else bisect.bisect_right(self.times, t_end)
+            return [event for event in self.events[lo:hi] if kind is None or event.kind == kind]
+
+    def state_at(self, kind, t):
+        # Last event of a kind at or before t, i.e. the chip map or robot job in effect at that moment
+        events = self.query(kind, t_end=t)
+        return events[-1] if events else None
+
+    def segments(self, kind):
+        # Intervals (start, end, event) during which each event of a kind was the latest one
+        events = self.query(kind)
+        ends = [event.t for event in events[1:]] + [np.inf]
+        return [(event.t, end, event) for event, end in zip(events, ends)]
+
+    def label_samples(self, times, kind):
+        # Index into segments(kind) for every sample time, -1 for samples before the first event
+        starts = np.array([event.t for event in self.query(kind)])
+        return np.searchsorted(starts, np.asarray(times), side='right') - 1
+
+    def slice_samples(self, times, kind, predicate):
+        # Mask of the samples taken while the state of a kind satisfied predicate(event)
+        segments = self.segments(kind)
+        keep = np.array([predicate(event) for _, _, event in segments] + [False], dtype=bool)
+        return keep[self.label_samples(times, kind)]  # -1 picks the trailing False
+
+    def clear(self):
+        with self.lock:
+            self.events.clear()
+            self.times.clear()
+            self.offsets.clear()
+
+
+TIMELINE = Timeline()
@@ -1,8 +1,12 @@
+from PyQt6.QtCore import pyqtSignal
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QTextEdit
 
 class DebugWindow(QWidget):
+    text_written = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
+        self.text_written.connect(self.append_text)  # Queued onto the GUI thread when printing from a worker
 
         self.setGeometry(0, 0, 700, 500)
         self.setWindowTitle("Debug Display")
@@ -17,4 +21,10 @@ class DebugWindow(QWidget):
         self.setLayout(layout)
 
     def write(self, text):
+        self.text_written.emit(text)
+
+    def flush(self):
+        pass
+
+    def append_text(self, text):
         self.text_edit.append(text.rstrip())
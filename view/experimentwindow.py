@@ -1,52 +1,28 @@
-import platform
 import os
-import random
+import threading
 from PyQt6 import QtCore
 from PyQt6.QtWidgets import QLabel, QLineEdit, QPushButton, QFormLayout, QHBoxLayout, QWidget, QDialog, QMainWindow, \
-    QApplication, QComboBox, QListWidget, QVBoxLayout, QGridLayout, QSpacerItem, QSizePolicy, QDialogButtonBox
-from grbl_streamer import GrblStreamer
-import time
+    QApplication, QComboBox, QListWidget, QVBoxLayout, QGridLayout, QSpacerItem, QSizePolicy, QDialogButtonBox, \
+    QMessageBox, QFileDialog
 
 import experiment
 import fileio
+import hardware
+import manifest
+import queueopt
+from databus import DataBus
+from hardware import init_adlink, init_par, init_robot
+from postprocess import PostProcessor
+from queuejournal import QueueJournal
+from resultcache import ResultCache
+from scheduler import ExperimentScheduler
 from definitions import ROOT_DIR, CONFIG, GET_ROBOT_ENABLED, GET_PAR_ENABLED, GET_COUNTER_ELECTRODE, \
     GET_REFERENCE_ELECTRODE, GET_WORKING_ELECTRODE
-
-if platform.system() != 'Darwin':
-    from par import PAR
-    from adlink import Adlink
 from view.gridwidget import GridWidget
+from view.liveplot import LivePlot
 from view.robotwindow import RobotWindow
 from view.setupwindow import SetupWindow
 
-def grbl_callback(eventstring, *data):
-    args = []
-    for d in data:
-        args.append(str(d))
-    print("GRBL CALLBACK: event={} data={}".format(eventstring.ljust(30), ", ".join(args)))
-
-def init_adlink():
-    adlink_card = Adlink()
-    print("DEBUG MESSAGE: Adlink Card Initialized")
-    return adlink_card
-
-def init_par():
-    kbio_port = CONFIG.get('Ports', 'par_port')
-    ec_lab = PAR(kbio_port)
-    print("DEBUG MESSAGE: EC-Lab PAR Initialized")
-    return ec_lab
-
-def init_robot():
-    grbl = GrblStreamer(grbl_callback)
-    grbl.setup_logging()
-    grbl_port = CONFIG.get('Ports', 'robot_port')
-    grbl.cnect(grbl_port, 115200)
-    print("DEBUG MESSAGE: GRBL Connected")
-    time.sleep(1)  # Let grbl connect
-    grbl.killalarm()  # Turn off alarm on startup
-    print("DEBUG MESSAGE: GRBL Alarm Turned off")
-    return grbl
-
 
 class SolutionDialog(QDialog):
     def __init__(self, parent=None):
@@ -90,17 +66,19 @@ class SolutionDialog(QDialog):
 #     print(data)
 
 class ExperimentWindow(QMainWindow):
+    queue_optimised = QtCore.pyqtSignal(object, object, float, float)  # Queue it started from, new order, costs
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("CombiMatrixAI")
 
         enable_robot = GET_ROBOT_ENABLED()
         enable_par = GET_PAR_ENABLED()
-        enable_adlink = any(electrode.startswith("Chip: CBMX") for electrode in
-                            [GET_COUNTER_ELECTRODE(), GET_WORKING_ELECTRODE(), GET_REFERENCE_ELECTRODE()])
+        enable_adlink = hardware.adlink_enabled()
 
-        if enable_adlink and platform.system() != 'Darwin':
-            self.adlink_card = init_adlink()
+        if enable_adlink and hardware.adlink_supported():
+            self.adlink_manager = init_adlink()
+            self.adlink_card = self.adlink_manager.card(0)
         if enable_robot:
             self.grbl = init_robot()
         if enable_par:
@@ -138,6 +116,9 @@ class ExperimentWindow(QMainWindow):
 
         self.run_cv_button = QPushButton("Run Experiments", self)
         self.run_cv_button.clicked.connect(lambda: self.run_experiments(enable_robot, enable_adlink, enable_par))
+        self.resume_button = QPushButton("Resume Queue", self)
+        self.resume_button.clicked.connect(
+            lambda: self.run_experiments(enable_robot, enable_adlink, enable_par, resume=True))
         self.exit_button = QPushButton("Exit", self)
         self.exit_button.clicked.connect(QApplication.instance().quit)
 
@@ -174,10 +155,23 @@ class ExperimentWindow(QMainWindow):
         self.update_experiment_button.clicked.connect(self.update_experiment)
         self.delete_experiment_button = QPushButton("Delete Experiment", self)
         self.delete_experiment_button.clicked.connect(self.delete_experiment)
+        self.pin_experiment_button = QPushButton("Pin Experiment", self)
+        self.pin_experiment_button.clicked.connect(self.pin_experiment)
+        self.optimise_queue_button = QPushButton("Optimise Queue", self)
+        self.optimise_queue_button.clicked.connect(self.optimise_queue)
+        self.queue_optimised.connect(self.apply_optimised_queue)
+        self.import_manifest_button = QPushButton("Import Manifest", self)
+        self.import_manifest_button.clicked.connect(self.import_manifest)
 
         self.grid_widget = GridWidget(5)
+        self.live_plot = LivePlot()
 
         self.curr_exp_index = 0
+        self.run_thread = None
+        self.journal = QueueJournal()
+        self.postprocess = PostProcessor()
+        if self.journal.unfinished() is not None:
+            print("The last experiment campaign did not finish, use Resume Queue to carry on with it")
         # TODO: ADD COMPATIBILITY WITH NEW TECHNIQUES
         self.experiments_list = [experiment.Experiment("null",
                                                        self.blocks[self.blocks_dropdown.currentText()],
@@ -197,6 +191,7 @@ class ExperimentWindow(QMainWindow):
 
         layout_top = QGridLayout()
         layout_top.addWidget(self.setup_button, 0, 0)
+        layout_top.addWidget(self.resume_button, 0, 1)
         layout_top.addWidget(self.robot_controls_button, 0, 2)
         layout_top.addWidget(self.chip_test_button, 0, 3)
         layout_top.addWidget(self.run_cv_button, 0, 4)
@@ -220,15 +215,19 @@ class ExperimentWindow(QMainWindow):
         layout_middle_grid.addWidget(self.save_experiment_button, 4, 0)
         layout_middle_grid.addWidget(self.update_experiment_button, 4, 1)
         layout_middle_grid.addWidget(self.delete_experiment_button, 4, 2)
+        layout_middle_grid.addWidget(self.pin_experiment_button, 5, 0)
+        layout_middle_grid.addWidget(self.optimise_queue_button, 5, 1)
+        layout_middle_grid.addWidget(self.import_manifest_button, 5, 2)
         spacer = QSpacerItem(125, 125, QSizePolicy.Policy.Fixed,
                              QSizePolicy.Policy.Minimum)
-        layout_middle_grid.addItem(spacer, 5, 0)
-        layout_middle_grid.addItem(spacer, 5, 1)
+        layout_middle_grid.addItem(spacer, 6, 0)
+        layout_middle_grid.addItem(spacer, 6, 1)
         layout_middle.addLayout(layout_middle_grid)
         layout_middle.addWidget(self.experiments_tab)
         layout_middle.addWidget(self.grid_widget, 0,
                                 QtCore.Qt.AlignmentFlag.AlignTop | QtCore.Qt.AlignmentFlag.AlignRight)  # Place the grid widget next to the other widgets
         layout_master.addLayout(layout_middle)
+        layout_master.addWidget(self.live_plot)
 
         layout_master.addWidget(
             QLabel(
@@ -248,18 +247,39 @@ class ExperimentWindow(QMainWindow):
             self.solution_input.setText(f"{data['cas']}, {data['stock']}, {data['amount']}, {data['concentration']}")
             print(data)  # Add more logic here as needed
 
-    def run_experiments(self, enable_robot, enable_adlink, enable_par):
-        index = 0
-        for exp in self.experiments_list:
-            if enable_robot:
-                self.execute_gcode(exp.gcode)
-            if enable_adlink:
-                self.load_block(exp.block, True)
-            if enable_par:
-                self.ec_lab.cyclic_voltammetry(exp.vcfg, index)
+    def run_experiments(self, enable_robot, enable_adlink, enable_par, resume=False):
+        if self.run_thread is not None and self.run_thread.is_alive():
+            print("Experiments are already running")
+            return
 
+        def measure(exp, index, output):
+            written = None
+            if enable_par:
+                self.live_plot.clear()
+                bus = DataBus()
+                bus.subscribe("plot", self.live_plot.feed, "drop_oldest", maxsize=16)
+                written = self.ec_lab.cyclic_voltammetry(exp.vcfg, str(index), output, bus)
+                exp.stop_reason = self.ec_lab.stop_reason
             print("Experiment completed")
-            index += 1
+            return written
+
+        scheduler = ExperimentScheduler(
+            move=(lambda exp: self.execute_gcode(exp.gcode, wait=True)) if enable_robot else None,
+            program=(lambda exp, card_num, channel: self.adlink_manager.card(card_num).set_chip_map(
+                channel, exp.block.chipmap())) if enable_adlink else None,
+            measure=measure,
+            sockets=self.adlink_manager.sockets() if enable_adlink else None,
+            cache=ResultCache() if CONFIG.getboolean('Results', 'skip_completed', fallback=True) else None,
+            revalidate=CONFIG.getboolean('Results', 'revalidate', fallback=False),
+            journal=self.journal,
+            postprocess=self.postprocess)
+
+        # Run off the GUI thread so the window stays responsive while devices work
+        if resume:
+            self.run_thread = threading.Thread(target=scheduler.resume, daemon=True)
+        else:
+            self.run_thread = threading.Thread(target=scheduler.run, args=(list(self.experiments_list),), daemon=True)
+        self.run_thread.start()
 
     def item_created(self, text):
         if text.split(',')[0].strip() == "Block Created":
@@ -277,50 +297,23 @@ class ExperimentWindow(QMainWindow):
             self.cvs_dropdown.setCurrentIndex(new_index)
 
     def chip_test(self, channel):
-        for i in range(7):
-            match i:
-                case 0:
-                    chipmap_in = [[0] * 16 for _ in range(64)]
-                case 1:
-                    chipmap_in = [[1] * 16 for _ in range(64)]
-                case 2:
-                    chipmap_in = [[2] * 16 for _ in range(64)]
-                case 3:
-                    chipmap_in = [[3] * 16 for _ in range(64)]
-                case 4:
-                    chipmap_in = [[1 if (r + c) % 2 == 0 else 2 for c in range(16)] for r in range(64)]
-                case 5:
-                    chipmap_in = [[2 if (r + c) % 2 == 0 else 3 for c in range(16)] for r in range(64)]
-                case 6:
-                    chipmap_in = [[random.randint(0, 3) for _ in range(16)] for _ in range(64)]
-                case _:
-                    break
-
-        self.adlink_card.set_chip_map(channel, chipmap_in)
-        chipmap_out = self.adlink_card.get_chip_map(channel)
+        report = self.adlink_card.self_test(channel)
 
+        # Show the last pattern, with every cell that failed any step in red
+        last = report.expected[-1]
+        failed = report.failures.any(axis=0)
         for row in range(64):
             for column in range(16):
-                self.grid_widget.set_square_color(row, column,
-                                                  chipmap_in[row][column], chipmap_out[row][column])
+                value = int(last[row][column])
+                self.grid_widget.set_square_color(row, column, value, -1 if failed[row][column] else value)
 
-        if chipmap_in == chipmap_out:
-            print(f"Test {i} Passed")
-        else:
-            print(f"Test {i} Failed")
-            differences = [
-                (r, c, chipmap_in[r][c], chipmap_out[r][c])
-                for r in range(len(chipmap_in))
-                for c in range(len(chipmap_in[r]))
-                if chipmap_in[r][c] != chipmap_out[r][c]
-            ]
-            for row, col, value1, value2 in differences:
-                print(f"Row {row}, Col {col}: chipmap_in has {value1}, chipmap_out has {value2}")
-
-    def execute_gcode(self, gcode):
-        gcode_dir = os.path.join(os.path.dirname(__file__), 'gcode', gcode.file)
-        self.grbl.load_file(gcode_dir)
-        self.grbl.job_run()
+        print(report.summary())
+        rates = report.cell_failure_rate()
+        for row, col in report.bad_cells():
+            print(f"Row {row}, Col {col}: failed {rates[row][col]:.0%} of steps")
+
+    def execute_gcode(self, gcode, wait=False):
+        hardware.execute_gcode(self.grbl, gcode, wait)
 
     def tile_block(self):
         self.experiments_list[self.curr_exp_index].tile_block()
@@ -336,10 +329,9 @@ class ExperimentWindow(QMainWindow):
     def load_block(self, block, set_card=False):
         # Logic for loading the block
         self.grid_widget.clear()
-        current_map = [[0] * 16 for _ in range(64)]
+        current_map = block.chipmap()
         for i in range(block.num_rows):
             for j in range(block.num_cols):
-                current_map[block.start_row + i][block.start_col + j] = block.definition[i][j]
                 self.grid_widget.set_square_color(block.start_row + i, block.start_col + j,
                                                   current_map[block.start_row + i][block.start_col + j])
         if set_card:
@@ -391,3 +383,56 @@ class ExperimentWindow(QMainWindow):
         del self.experiments_list[self.curr_exp_index]
         self.experiments_tab.clear()
         self.experiments_tab.addItems([str(exp) for exp in self.experiments_list])
+
+    def pin_experiment(self):
+        if self.curr_exp_index == -1:
+            return
+        self.experiments_list[self.curr_exp_index].pinned = not self.experiments_list[self.curr_exp_index].pinned
+        self.update_exp_list()
+
+    def optimise_queue(self):
+        # Long queues take a while, so the search runs on its own thread and reports back through a signal
+        queue = list(self.experiments_list)
+        pinned = [i for i, exp in enumerate(queue) if exp.pinned]
+        self.optimise_queue_button.setEnabled(False)
+
+        def search():
+            try:
+                cost = queueopt.QueueCost(self.gcode_dir)
+                new_order = queueopt.optimise(queue, cost, pinned)
+                self.queue_optimised.emit(queue, new_order, cost.total(queue), cost.total(new_order))
+            except Exception as e:
+                print(f"Queue optimisation failed: {e}")
+                self.queue_optimised.emit(queue, None, 0.0, 0.0)
+
+        threading.Thread(target=search, daemon=True).start()
+
+    def apply_optimised_queue(self, queue, new_order, before, after):
+        self.optimise_queue_button.setEnabled(True)
+        if new_order is None:
+            return
+        if queue != self.experiments_list:
+            print("Queue changed while it was being optimised, optimise it again")
+            return
+        answer = QMessageBox.question(self, "Optimise Queue",
+                                      f"Predicted setup time {before:.1f} s -> {after:.1f} s "
+                                      f"(saves {before - after:.1f} s). Apply new order?")
+        if answer == QMessageBox.StandardButton.Yes:
+            self.experiments_list = new_order
+            self.experiments_tab.clear()
+            self.experiments_tab.addItems([str(exp) for exp in self.experiments_list])
+
+    def import_manifest(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Manifest", ROOT_DIR,
+                                              "Manifests (*.toml *.json *.csv)")
+        if not path:
+            return
+        library = {"blocks": self.blocks, "vcfgs": self.cvs, "gcode": self.gcode}
+        try:
+            experiments = manifest.load_manifest(path, library)
+        except (ValueError, OSError) as e:
+            QMessageBox.warning(self, "Manifest Error", str(e))
+            return
+        self.experiments_list.extend(experiments)
+        self.experiments_tab.addItems([str(exp) for exp in experiments])
+        print(f"Imported {len(experiments)} experiments from {path}")
@@ -0,0 +1,98 @@
+import numpy as np
+from PyQt6.QtCore import QPointF, QTimer
+from PyQt6.QtGui import QColor, QPainter, QPen, QPolygonF
+from PyQt6.QtWidgets import QWidget
+
+from definitions import CONFIG
+from ringbuffer import RingBuffer
+
+MAX_POINTS = 4096  # Decimated points kept for the whole run, twice the widest plot is plenty
+MARGIN = 40
+
+
+def min_max(points, bucket):
+    # Keeps the lowest and highest current of every bucket of consecutive points, in the order they came,
+    # so the shape of each sweep survives however many points a pixel covers
+    buckets = len(points) // bucket
+    if buckets == 0:
+        return points[:0]
+    grouped = points[:buckets * bucket].reshape(buckets, bucket, 2)
+    low = grouped[:, :, 1].argmin(axis=1)
+    high = grouped[:, :, 1].argmax(axis=1)
+    first, second = np.minimum(low, high), np.maximum(low, high)
+    rows = np.arange(buckets)
+    return np.stack((grouped[rows, first], grouped[rows, second]), axis=1).reshape(-1, 2)
+
+
+class LivePlot(QWidget):
+    # Current against potential while a CV runs. feed() is a data bus consumer and only copies into a ring
+    # buffer. A timer on the GUI thread, capped at [Plot] fps, folds whatever is new into a level
+    # of detail history: full buckets become min/max pairs, and when there are too many points the bucket
+    # size doubles and the history is decimated again, so a run of 10^6 points still draws a few thousand.
+    def __init__(self, capacity=1 << 18):
+        super().__init__()
+        self.setMinimumHeight(250)
+        self.setStyleSheet("background-color: black;")
+        self.buffer = RingBuffer(capacity, 2, np.float32)
+        self.generation = 0  # Bumped by clear() so the GUI thread knows to drop its history
+        self.reset()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(int(1000 / CONFIG.getfloat('Plot', 'fps', fallback=20)))
+
+    def reset(self):
+        self.seen_generation = self.generation
+        self.read = 0  # Buffer samples already folded in
+        self.bucket = 1  # Samples per min/max pair, 1 until the first decimation
+        self.history = np.zeros((0, 2), np.float32)
+        self.pending = np.zeros((0, 2), np.float32)  # Samples waiting for their bucket to fill
+
+    def feed(self, current_values, data_info, columns):
+        if "Ewe" in columns:
+            self.buffer.extend(np.column_stack((columns["Ewe"], columns["I"])))
+
+    def clear(self):
+        self.buffer.clear()
+        self.generation += 1
+
+    def refresh(self):
+        if self.generation != self.seen_generation or self.buffer.total < self.read:
+            self.reset()
+        if self.buffer.total == self.read:
+            return
+        new, first = self.buffer.since(self.read)
+        self.read = first + len(new)
+        self.pending = np.concatenate((self.pending, new))
+        done = len(self.pending) - len(self.pending) % self.bucket
+        self.history = np.concatenate((self.history, self.pending[:done] if self.bucket == 1
+                                       else min_max(self.pending[:done], self.bucket)))
+        self.pending = self.pending[done:]
+        while len(self.history) > MAX_POINTS:
+            # Two min/max pairs (or four raw samples) make one pair at the new bucket size
+            self.bucket = 4 if self.bucket == 1 else self.bucket * 2
+            cut = len(self.history) - len(self.history) % 4
+            self.history = np.concatenate((min_max(self.history[:cut], 4), self.history[cut:]))
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("black"))
+        points = np.concatenate((self.history, self.pending))
+        if len(points) < 2:
+            return
+        low, high = points.min(axis=0), points.max(axis=0)
+        span = np.where(high > low, high - low, 1)
+        width, height = self.width() - 2 * MARGIN, self.height() - 2 * MARGIN
+        x = MARGIN + (points[:, 0] - low[0]) / span[0] * width
+        y = MARGIN + height - (points[:, 1] - low[1]) / span[1] * height
+
+        painter.setPen(QPen(QColor("grey")))
+        painter.drawRect(MARGIN, MARGIN, width, height)
+        painter.drawText(MARGIN, self.height() - 10, f"{low[0]:.3f} V")
+        painter.drawText(MARGIN + width - 60, self.height() - 10, f"{high[0]:.3f} V")
+        painter.drawText(MARGIN, MARGIN - 10, f"{high[1]:.3e} A")
+        painter.drawText(MARGIN, MARGIN + height + 15, f"{low[1]:.3e} A")
+        painter.setPen(QPen(QColor("yellow")))
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.drawPolyline(QPolygonF([QPointF(a, b) for a, b in zip(x.tolist(), y.tolist())]))